@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Local stand-in of the OBS API (and of the SMELT GraphQL endpoint) for the
+benchmarks. It serves the synthetic payloads of fixtures.py, or the files of
+a fixtures directory, after an injected latency and counts the requests.
+
+    python benchmarks/fake_obs.py --port 8765 --latency 20 --packages 10000
+
+A file of the fixtures directory overrides the generated response of a path,
+e.g. DIR/build/SUSE:SLFO:Main/_result for GET /build/SUSE:SLFO:Main/_result.
+
+GET /_bench/stats returns the request counts per endpoint as JSON and
+POST /_bench/reset clears them.
+"""
+
+import argparse
+import functools
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import fixtures
+
+
+def endpoint_name(method: str, path: str) -> str:
+    """
+    Group the requests per endpoint, e.g. "GET /source/*".
+    """
+    segments = path.strip("/").split("/")
+    depth = 2 if segments[0] == "search" else 1
+    name = "/" + "/".join(segments[:depth])
+    if len(segments) > depth:
+        name += "/*"
+    return f"{method} {name}"
+
+
+class FakeObs:
+    """
+    Routes of the fake OBS, the generated payloads are cached per size so the
+    generation is not part of the measured time after the first request.
+    """
+
+    def __init__(self, sizes: fixtures.Sizes, latency: float, fixtures_dir: str):
+        self.sizes = sizes
+        self.latency = latency
+        self.fixtures_dir = fixtures_dir
+        self.stats: dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def count(self, name: str) -> None:
+        with self.lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+
+    def reset(self) -> None:
+        with self.lock:
+            self.stats.clear()
+
+    def is_staging(self, project: str) -> bool:
+        return ":Staging:" in project
+
+    @functools.cache
+    def names(self, project: str) -> tuple[str, ...]:
+        if self.is_staging(project):
+            return tuple(fixtures.package_names(self.sizes.staging_packages))
+        return tuple(fixtures.package_names(self.sizes.packages))
+
+    @functools.cache
+    def directory(self, project: str) -> bytes:
+        return fixtures.directory(list(self.names(project))).encode()
+
+    @functools.cache
+    def build_status(self, project: str) -> bytes:
+        names = list(self.names(project))
+        return fixtures.build_status(project, names, self.sizes).encode()
+
+    @functools.cache
+    def summary(self, moved: bool) -> bytes:
+        return fixtures.summary_staging(self.sizes, 7 if moved else 0).encode()
+
+    @functools.cache
+    def search_requests(self, state: str, offset: int, limit: int) -> bytes:
+        return fixtures.search_requests(state, self.sizes, offset, limit).encode()
+
+    def fixture(self, path: str) -> bytes | None:
+        if not self.fixtures_dir:
+            return None
+        filename = os.path.join(self.fixtures_dir, path.strip("/"))
+        if os.path.isfile(filename):
+            with open(filename, "rb") as f:
+                return f.read()
+        return None
+
+    def respond(self, method: str, path: str, query: dict, body: bytes) -> bytes:
+        """
+        :return: response body, raise LookupError for a 404
+        """
+        content = self.fixture(path) if method == "GET" else None
+        if content is not None:
+            return content
+        segments = path.strip("/").split("/")
+        param = {key: values[-1] for key, values in query.items()}
+
+        if segments[0] == "source" and len(segments) == 2:
+            return self.directory(segments[1])
+        if segments[0] == "source" and len(segments) == 3:
+            if param.get("view") == "cpio":
+                moved = segments[2] == "000product" or not self.is_staging(segments[1])
+                return fixtures.cpio({"summary-staging.txt": self.summary(moved)})
+            raise LookupError(path)
+        if segments[0] == "source" and len(segments) == 4:
+            if segments[3].endswith(".productcompose"):
+                return fixtures.productcompose(self.sizes).encode()
+            if segments[3] == "summary-staging.txt":
+                return self.summary(segments[2] == "000product")
+            raise LookupError(path)
+        if segments[0] == "build" and segments[-1] == "_result":
+            project = segments[1]
+            if param.get("view") == "binarylist":
+                packages = query.get("package") or list(self.names(project))
+                repository = param.get("repository", "standard")
+                return fixtures.build_binarylist(project, repository, packages).encode()
+            return self.build_status(project)
+        if path == "/search/request":
+            state = "accepted" if "accepted" in param.get("match", "") else "review"
+            offset = int(param.get("offset") or 0)
+            # the pages after the first one start after the last id
+            last_id = re.search(r"@id>(\d+)", param.get("match", ""))
+            if last_id:
+                offset += int(last_id.group(1)) + 1 - fixtures.FIRST_REQUEST_ID
+            return self.search_requests(state, offset, int(param.get("limit") or 0))
+        if segments[0] == "request" and len(segments) == 2:
+            if method == "POST" and param.get("cmd") == "diff":
+                return fixtures.request_diff(segments[1], self.sizes).encode()
+            if method == "POST":
+                return b'<status code="ok"><summary>Ok</summary></status>'
+            return fixtures.request(
+                int(segments[1]), "review", "2025-02-01T00:00:00", "pkg00001"
+            ).encode()
+        if path == "/search/published/binary/id":
+            name = re.search(r"@name=[\"']([^\"']*)", param.get("match", ""))
+            return fixtures.published_binary(name.group(1) if name else "").encode()
+        if path == "/search/owner":
+            return fixtures.owner(param.get("package", "")).encode()
+        if path == "/search/person":
+            logins = re.findall(r"@login=[\"']([^\"']*)", param.get("match", ""))
+            return fixtures.people(logins).encode()
+        if segments[0] == "group" and len(segments) == 2:
+            return fixtures.group(segments[1]).encode()
+        if segments[0] == "graphql":
+            return graphql(body)
+        raise LookupError(path)
+
+
+def graphql(body: bytes) -> bytes:
+    """
+    Answer the aliased binaries() and incidents() lookups of search_binary.py
+    and incident_repos.py.
+    """
+    query = parse_qs(body.decode()).get("query", [""])[0]
+    data = {}
+    for alias in re.findall(r"(b\d+): binaries", query):
+        node = {
+            "channel": {"name": "SLE-Product-SLES15-SP6-Updates"},
+            "project": {"name": "SUSE:SLE-15-SP6:Update"},
+            "package": {"name": "pkg"},
+        }
+        data[alias] = {
+            "edges": [{"node": {"channelsources": {"edges": [{"node": node}]}}}]
+        }
+    for alias, iid in re.findall(r"(i(\d+)): incidents", query):
+        repos = [{"node": {"name": f"SUSE_Updates_{iid}_{arch}"}} for arch in "ab"]
+        status = "done" if int(iid) % 2 == 0 else "active"
+        data[alias] = {
+            "edges": [
+                {"node": {"status": {"name": status}, "repositories": {"edges": repos}}}
+            ]
+        }
+    return json.dumps({"data": data}).encode()
+
+
+def make_handler(obs: FakeObs) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):  # noqa: A002
+            pass
+
+        def reply(self, status: int, content: bytes, content_type: str) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def handle_method(self, method: str) -> None:
+            url = urlsplit(self.path)
+            path = unquote(url.path)
+            query = parse_qs(url.query, keep_blank_values=True)
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+            if path == "/_bench/stats":
+                self.reply(200, json.dumps(obs.stats).encode(), "application/json")
+                return
+            if path == "/_bench/reset":
+                obs.reset()
+                self.reply(200, b"{}", "application/json")
+                return
+            obs.count(endpoint_name(method, path))
+            if obs.latency:
+                time.sleep(obs.latency)
+            try:
+                content = obs.respond(method, path, query, body)
+            except LookupError:
+                self.reply(404, b'<status code="not_found"/>', "application/xml")
+                return
+            if path.startswith("/graphql"):
+                self.reply(200, content, "application/json")
+            else:
+                self.reply(200, content, "application/xml")
+
+        def do_GET(self) -> None:
+            self.handle_method("GET")
+
+        def do_POST(self) -> None:
+            self.handle_method("POST")
+
+    return Handler
+
+
+def build_parser() -> argparse.ArgumentParser:
+    defaults = fixtures.Sizes()
+    parser = argparse.ArgumentParser(description="Fake OBS API for the benchmarks.")
+    parser.add_argument("--port", type=int, default=8765, help="0 picks a free port")
+    parser.add_argument("--latency", type=float, default=0, help="milliseconds")
+    parser.add_argument(
+        "--fixtures", default="", help="directory of recorded responses"
+    )
+    for field in [
+        "packages",
+        "staging_packages",
+        "summary_lines",
+        "requests",
+        "diff_size",
+    ]:
+        parser.add_argument(
+            f"--{field.replace('_', '-')}", type=int, default=getattr(defaults, field)
+        )
+    return parser
+
+
+def serve(options: argparse.Namespace) -> ThreadingHTTPServer:
+    sizes = fixtures.Sizes(
+        packages=options.packages,
+        staging_packages=options.staging_packages,
+        summary_lines=options.summary_lines,
+        requests=options.requests,
+        diff_size=options.diff_size,
+    )
+    obs = FakeObs(sizes, options.latency / 1000, options.fixtures)
+    server = ThreadingHTTPServer(("127.0.0.1", options.port), make_handler(obs))
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    server = serve(build_parser().parse_args())
+    print(f"http://127.0.0.1:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,223 @@
+"""
+Synthetic OBS payloads for the benchmarks, generated from a seed so every run
+of a given size serves exactly the same data.
+"""
+
+import random
+from dataclasses import dataclass
+from xml.sax.saxutils import quoteattr
+
+ARCHS = ["x86_64", "aarch64", "s390x", "ppc64le"]
+REPOSITORIES = ["standard", "images", "product", "ports"]
+CODES = ["succeeded", "failed", "excluded", "disabled", "unknown"]
+GROUPS = ["sle-minimal", "sle-base", "sle-server", "sle-desktop", "unsorted"]
+FIRST_REQUEST_ID = 100000
+
+
+@dataclass
+class Sizes:
+    # packages of a project
+    packages: int = 10000
+    # packages of a staging project
+    staging_packages: int = 300
+    # lines of summary-staging.txt
+    summary_lines: int = 100000
+    # requests returned by a request search
+    requests: int = 500
+    # size of a request diff in bytes
+    diff_size: int = 20000
+    seed: int = 42
+
+
+def package_names(count: int, prefix: str = "pkg") -> list[str]:
+    """
+    Package names, with some multibuild flavors (pkg:flavor) and the names
+    matched by the artifacts patterns.
+    """
+    names = ["SL-Micro", "kiwi-templates-Minimal", "000productcompose:sles"]
+    names.extend(f"{prefix}{index:05d}" for index in range(count - len(names)))
+    return names
+
+
+def directory(names: list[str]) -> str:
+    """
+    /source/<project> listing.
+    """
+    entries = "".join(f"<entry name={quoteattr(name)}/>" for name in names)
+    return f'<directory count="{len(names)}">{entries}</directory>'
+
+
+def build_status(project: str, names: list[str], sizes: Sizes) -> str:
+    """
+    /build/<project>/_result, the status of every package per repository and
+    architecture.
+    """
+    rand = random.Random(sizes.seed)
+    results = []
+    for repository in REPOSITORIES:
+        for arch in ARCHS[:2]:
+            statuses = "".join(
+                f'<status package={quoteattr(name)} code="{rand.choice(CODES)}"/>'
+                for name in names
+            )
+            results.append(
+                f'<result project="{project}" repository="{repository}" '
+                f'arch="{arch}" code="published" state="published">{statuses}</result>'
+            )
+    return f"<resultlist state=\"{sizes.seed}\">{''.join(results)}</resultlist>"
+
+
+def build_binarylist(project: str, repository: str, packages: list[str]) -> str:
+    """
+    /build/<project>/_result?view=binarylist for some packages of a repository.
+    """
+    results = []
+    for arch in ARCHS[:2]:
+        binarylists = "".join(
+            f"<binarylist package={quoteattr(package)}>"
+            f'<binary filename="{package}-1.0-1.1.{arch}.rpm" size="1024"/>'
+            f'<binary filename="{package}.{arch}.raw.xz" size="1024"/>'
+            f'<binary filename="{package}.{arch}.packages" size="1024"/>'
+            f'<binary filename="_statistics" size="1024"/>'
+            "</binarylist>"
+            for package in packages
+        )
+        results.append(
+            f'<result project="{project}" repository="{repository}" '
+            f'arch="{arch}">{binarylists}</result>'
+        )
+    return f"<resultlist>{''.join(results)}</resultlist>"
+
+
+def request(request_id: int, state: str, when: str, package: str) -> str:
+    action_type = "delete" if request_id % 10 == 0 else "submit"
+    source = (
+        ""
+        if action_type == "delete"
+        else f'<source project="devel:{package}" package="{package}" rev="1"/>'
+    )
+    reviews = "".join(
+        f'<review state="accepted" by_group="group-{index}" when="{when}" who="bot">'
+        "<comment>ok</comment></review>"
+        for index in range(5)
+    )
+    return (
+        f'<request id="{request_id}" creator="user{request_id % 50}">'
+        f'<action type="{action_type}">{source}'
+        f'<target project="SUSE:SLFO:Main" package="{package}"/></action>'
+        f'<state name="{state}" who="user1" when="{when}"><comment/></state>'
+        f"{reviews}"
+        '<review state="new" by_group="sle-release-managers"/>'
+        '<review state="new" by_project="SUSE:SLFO:Main:Staging:A"/>'
+        f"<description>{'update ' * 40}</description>"
+        "</request>"
+    )
+
+
+def search_requests(state: str, sizes: Sizes, offset: int = 0, limit: int = 0) -> str:
+    """
+    /search/request result with sizes.requests requests, or the page of
+    limit requests from offset.
+    """
+    indexes = range(sizes.requests)[offset:]
+    if limit:
+        indexes = indexes[:limit]
+    requests = "".join(
+        request(
+            FIRST_REQUEST_ID + index,
+            state,
+            f"2025-02-{1 + index % 28:02d}T{index % 24:02d}:00:00",
+            f"pkg{index:05d}",
+        )
+        for index in indexes
+    )
+    return f'<collection matches="{len(indexes)}">{requests}</collection>'
+
+
+def request_diff(request_id: str, sizes: Sizes) -> str:
+    lines = [f"--- a/pkg.spec ({request_id})", "+++ b/pkg.spec"]
+    while sum(len(line) + 1 for line in lines) < sizes.diff_size:
+        lines.append(f"+Version: {len(lines)}")
+    return "\n".join(lines) + "\n"
+
+
+def summary_staging(sizes: Sizes, moved: int = 0) -> str:
+    """
+    summary-staging.txt with sizes.summary_lines "package:group" lines, moved
+    changes the group of some packages, to compare 2 summaries.
+    """
+    rand = random.Random(sizes.seed)
+    lines = []
+    for index in range(sizes.summary_lines):
+        group = rand.choice(GROUPS)
+        if moved and index % moved == 0:
+            group = GROUPS[(GROUPS.index(group) + 1) % len(GROUPS)]
+        lines.append(f"bin{index:06d}:{group}")
+    return "\n".join(lines) + "\n"
+
+
+def productcompose(sizes: Sizes) -> str:
+    """
+    default.productcompose with the binaries of the project.
+    """
+    packages = "".join(f"      - bin{index:06d}\n" for index in range(sizes.packages))
+    return (
+        "flavors:\n"
+        "  sles_x86:\n    architectures: [x86_64]\n"
+        "  sles_arm:\n    architectures: [aarch64]\n"
+        "packagesets:\n"
+        f"  - name: main\n    packages:\n{packages}"
+    )
+
+
+def published_binary(name: str) -> str:
+    return (
+        f'<collection matches="1"><binary name="{name}" project="SUSE:SLFO:Main:Build" '
+        f'package="src-{name}" repository="standard" arch="x86_64"/></collection>'
+    )
+
+
+def owner(package: str) -> str:
+    return (
+        f'<collection><owner rootproject="SUSE:SLFO:Main" project="SUSE:SLFO:Main" '
+        f'package="{package}"><person name="user1" role="bugowner"/>'
+        '<person name="user2" role="bugowner"/></owner></collection>'
+    )
+
+
+def group(name: str) -> str:
+    people = "".join(f'<person userid="user{index}"/>' for index in range(300))
+    return (
+        f"<group><title>{name}</title><email>{name}@example.com</email>"
+        f'<maintainer userid="user1"/><person>{people}</person></group>'
+    )
+
+
+def people(logins: list[str]) -> str:
+    persons = "".join(
+        f"<person><login>{login}</login><email>{login}@example.com</email>"
+        f"<realname>User {login}</realname><state>confirmed</state></person>"
+        for login in logins
+    )
+    return f"<collection>{persons}</collection>"
+
+
+def cpio(files: dict[str, bytes]) -> bytes:
+    """
+    cpio archive in newc format, as returned by OBS for view=cpio.
+    """
+    out = bytearray()
+
+    def add(name: str, data: bytes, mode: int) -> None:
+        encoded = name.encode() + b"\0"
+        fields = [0, mode, 0, 0, 1, 0, len(data), 0, 0, 0, 0, len(encoded), 0]
+        out.extend(b"070701" + b"".join(b"%08X" % field for field in fields))
+        out.extend(encoded)
+        out.extend(b"\0" * (-len(out) % 4))
+        out.extend(data)
+        out.extend(b"\0" * (-len(out) % 4))
+
+    for name, data in files.items():
+        add(name, data, 0o100644)
+    add("TRAILER!!!", b"", 0)
+    return bytes(out)
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+Benchmarks of the sle_tools subcommands and of the report scripts, run
+against the fake OBS of fake_obs.py and the fake osc of bin/osc.
+
+    python benchmarks/run.py                      # compare with baselines.json
+    python benchmarks/run.py --scenario artifacts --repeat 5
+    python benchmarks/run.py --check-time --check-memory
+    python benchmarks/run.py --update-baselines   # store the new baselines
+
+Every scenario is a separate process, run once to warm up and then --repeat
+times. The OBS requests and the osc invocations of a run do not depend on
+the machine: more than in the baselines are regressions and the exit code is
+1. The startup-* and complete-* scenarios hold the start up of sle_tools and
+its shell completion to the same budget on the modules they import
+(python -X importtime).
+
+The median wall time and the peak RSS of the process are printed, and only
+compared with --check-time (over the --tolerance) and --check-memory (over
+the --memory-tolerance): they depend on the machine and its load, store the
+baselines on the machine that runs the comparison.
+
+The baselines are only compared when they were stored with the same latency
+and payload sizes.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+import fake_obs
+import fixtures
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+BASELINES = os.path.join(BENCH_DIR, "baselines.json")
+STAGING = "SUSE:SLFO:Main:Staging:A"
+# seconds added to the wall time tolerance, the process start up is noisy
+WALL_SLACK = 0.25
+# scenarios held to their imports, the threads of the other scenarios make
+# the lazy imports vary a little
+STARTUP_SCENARIOS = ("startup-", "complete-")
+
+# name -> command, "{tools}" is sle_tools using the fake OBS, "{complete}"
+# completes the command line that follows it, "{python}" and "{url}" (the
+# fake OBS) are replaced
+SCENARIOS = {
+    "startup-help": ["{tools}", "--help"],
+    "startup-subcommand-help": ["{tools}", "reviews", "--help"],
+    "complete-subcommand": ["{complete}", "sle_tools re"],
+    "complete-options": ["{complete}", "sle_tools reviews --"],
+    "artifacts": ["{tools}", "artifacts"],
+    "packages": ["{tools}", "packages"] + [f"bin{i:06d}" for i in range(20)],
+    "reviews-approve": ["{tools}", "reviews", "--staging", "A", "--approve"],
+    "requests": ["{tools}", "requests", "-f", "2025-01-01", "--format", "json"],
+    "prjconf": ["{tools}", "prjconf", "-p", "SUSE:SLFO:Main", "-r"],
+    "prjconf-staging": ["{tools}", "prjconf", "-p", STAGING, "-s"],
+    "packagelist": ["{tools}", "packagelist", "-f", STAGING, "-t", "SUSE:SLFO:Main"],
+    "staging-packagelist-report": [
+        "{python}",
+        "staging-packagelist-report.py",
+        "-p",
+        STAGING,
+    ],
+    "staging-package-list-all": [
+        "{python}",
+        "staging-package-list-all.py",
+        "-p",
+        STAGING,
+    ],
+    "search-binary": ["{python}", "search_binary.py", "--api", "{url}/graphql/"]
+    + [f"bin{i:06d}" for i in range(200)],
+    "incident-repos": ["{python}", "incident_repos.py", "--api", "{url}/graphql/"]
+    + [str(30000 + i) for i in range(100)],
+}
+
+
+@dataclass
+class Result:
+    wall: float
+    http: int
+    osc: int
+    imports: int
+    rss_kb: int
+
+
+def get_stats(url: str) -> dict[str, int]:
+    with urllib.request.urlopen(f"{url}/_bench/stats") as response:
+        return json.load(response)
+
+
+def reset_stats(url: str) -> None:
+    request = urllib.request.Request(f"{url}/_bench/reset", method="POST")
+    urllib.request.urlopen(request).close()
+
+
+def run_once(name: str, url: str, env: dict, osc_log: str) -> Result:
+    """
+    Run a scenario and measure it, raise RuntimeError if it fails.
+    """
+    python = [sys.executable, "-X", "importtime"]
+    command = []
+    args = iter(SCENARIOS[name])
+    for arg in args:
+        if arg == "{tools}":
+            command.extend(python + ["sle_tools", "--osc-instance", url, "--no-cache"])
+        elif arg == "{complete}":
+            # argcomplete reads the command line from the environment
+            line = next(args)
+            env = dict(
+                env,
+                _ARGCOMPLETE="1",
+                COMP_LINE=line,
+                COMP_POINT=str(len(line)),
+                _ARGCOMPLETE_STDOUT_FILENAME=os.devnull,
+            )
+            command.extend(python + ["sle_tools"])
+        elif arg == "{python}":
+            command.extend(python)
+        else:
+            command.append(arg.format(url=url))
+    reset_stats(url)
+    open(osc_log, "w").close()
+    with tempfile.TemporaryFile() as stderr:
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            command,
+            cwd=REPO_DIR,
+            env=env,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=stderr,
+        )
+        _, status, usage = os.wait4(process.pid, 0)
+        wall = time.perf_counter() - started
+        process.returncode = os.waitstatus_to_exitcode(status)
+        stderr.seek(0)
+        output = stderr.read().decode(errors="replace")
+    if process.returncode != 0:
+        raise RuntimeError(
+            f"{name} failed with {process.returncode}:\n{output.strip()[-2000:]}"
+        )
+    # a line per imported module, after a header line
+    imports = sum(
+        1
+        for line in output.splitlines()
+        if line.startswith("import time:") and "[us]" not in line
+    )
+    with open(osc_log) as f:
+        osc = sum(1 for _ in f)
+    return Result(wall, sum(get_stats(url).values()), osc, imports, usage.ru_maxrss)
+
+
+def run_scenario(name: str, url: str, env: dict, osc_log: str, repeat: int) -> Result:
+    """
+    Warm up and run a scenario repeat times.
+
+    :return: median wall time, calls and imports of the last run and maximum
+             peak RSS
+    """
+    run_once(name, url, env, osc_log)
+    results = [run_once(name, url, env, osc_log) for _ in range(repeat)]
+    return Result(
+        statistics.median(result.wall for result in results),
+        results[-1].http,
+        results[-1].osc,
+        results[-1].imports,
+        max(result.rss_kb for result in results),
+    )
+
+
+def compare(
+    name: str,
+    result: Result,
+    baseline: dict,
+    tolerance: Optional[float] = None,
+    memory_tolerance: Optional[float] = None,
+) -> list[str]:
+    """
+    :param tolerance: allowed wall time increase, not compared if None
+    :param memory_tolerance: allowed peak RSS increase, not compared if None
+    :return: regressions of a scenario, empty if none
+    """
+    regressions = []
+    counts = ["http", "osc"]
+    if name.startswith(STARTUP_SCENARIOS):
+        counts.append("imports")
+    for count in counts:
+        if count in baseline and getattr(result, count) > baseline[count]:
+            regressions.append(
+                f"{name}: {getattr(result, count)} {count}, baseline {baseline[count]}"
+            )
+    if (
+        tolerance is not None
+        and result.wall > baseline["wall"] * (1 + tolerance) + WALL_SLACK
+    ):
+        regressions.append(
+            f"{name}: {result.wall:.2f}s, baseline {baseline['wall']:.2f}s "
+            f"+{tolerance:.0%}"
+        )
+    if memory_tolerance is not None and result.rss_kb > baseline["rss_kb"] * (
+        1 + memory_tolerance
+    ):
+        regressions.append(
+            f"{name}: {result.rss_kb // 1024}MiB peak RSS, baseline "
+            f"{baseline['rss_kb'] // 1024}MiB +{memory_tolerance:.0%}"
+        )
+    return regressions
+
+
+def print_row(name: str, result: Result, baseline: dict | None) -> None:
+    row = (
+        f"{name:<28} {result.wall:>8.2f}s {result.http:>6} {result.osc:>5} "
+        f"{result.imports:>7} {result.rss_kb // 1024:>6}MiB"
+    )
+    if baseline:
+        row += f"   (baseline {baseline['wall']:.2f}s {baseline['http']} "
+        row += f"{baseline['osc']} {baseline.get('imports', '-')} "
+        row += f"{baseline['rss_kb'] // 1024}MiB)"
+    print(row, flush=True)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = fake_obs.build_parser()
+    parser.description = "Benchmarks of sle_tools against a fake OBS."
+    parser.set_defaults(port=0, latency=20)
+    parser.add_argument(
+        "--scenario",
+        "-s",
+        action="append",
+        choices=list(SCENARIOS),
+        help="Scenario to run, can be repeated (default: all).",
+    )
+    parser.add_argument("--repeat", "-n", type=int, default=3)
+    parser.add_argument(
+        "--check-time",
+        action="store_true",
+        help="Also fail on a wall time over the --tolerance.",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.5,
+        help="Allowed wall time increase (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--check-memory",
+        action="store_true",
+        help="Also fail on a peak memory over the --memory-tolerance.",
+    )
+    parser.add_argument(
+        "--memory-tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed peak memory increase (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--update-baselines",
+        action="store_true",
+        help=f"Store the results in {os.path.relpath(BASELINES)}.",
+    )
+    return parser
+
+
+def start_server(
+    options: argparse.Namespace, settings: dict
+) -> tuple[subprocess.Popen, str]:
+    """
+    Start the fake OBS in its own process: the scenarios are forked from this
+    process and their peak RSS would include the generated payloads.
+
+    :return: process and URL of the fake OBS
+    """
+    command = [sys.executable, os.path.join(BENCH_DIR, "fake_obs.py"), "--port", "0"]
+    for name, value in settings.items():
+        command.extend([f"--{name.replace('_', '-')}", str(value)])
+    if options.fixtures:
+        command.extend(["--fixtures", options.fixtures])
+    server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    url = server.stdout.readline().strip()  # type: ignore
+    if not url:
+        raise SystemExit("The fake OBS did not start.")
+    return server, url
+
+
+def load_baselines() -> dict:
+    try:
+        with open(BASELINES, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"settings": {}, "scenarios": {}}
+
+
+def main() -> int:
+    options = build_parser().parse_args()
+    settings = {
+        "latency": options.latency,
+        **{
+            field: getattr(options, field)
+            for field in asdict(fixtures.Sizes())
+            if hasattr(options, field)
+        },
+    }
+    baselines = load_baselines()
+    comparable = baselines["settings"] == settings
+    if not comparable and not options.update_baselines:
+        print("Baselines stored with other settings, not compared.", file=sys.stderr)
+
+    server, url = start_server(options, settings)
+
+    regressions = []
+    failed = False
+    with tempfile.TemporaryDirectory(prefix="sle-bench-") as tmpdir:
+        osc_log = os.path.join(tmpdir, "osc.log")
+        env = dict(
+            os.environ,
+            PATH=os.path.join(BENCH_DIR, "bin") + os.pathsep + os.environ["PATH"],
+            BENCH_OBS_URL=url,
+            BENCH_OSC_LOG=osc_log,
+            CONFIG_DIR=os.path.join(REPO_DIR, "config_files"),
+            XDG_CACHE_HOME=os.path.join(tmpdir, "cache"),
+            PYTHONPATH=REPO_DIR,
+        )
+        print(
+            f"{'scenario':<28} {'wall':>9} {'http':>6} {'osc':>5} {'imports':>7} "
+            f"{'rss':>9}"
+        )
+        for name in options.scenario or SCENARIOS:
+            try:
+                result = run_scenario(name, url, env, osc_log, max(options.repeat, 1))
+            except RuntimeError as e:
+                print(e, file=sys.stderr)
+                failed = True
+                continue
+            baseline = baselines["scenarios"].get(name) if comparable else None
+            print_row(name, result, baseline)
+            if options.update_baselines:
+                baselines["scenarios"][name] = dict(
+                    asdict(result), wall=round(result.wall, 3)
+                )
+            elif baseline:
+                regressions.extend(
+                    compare(
+                        name,
+                        result,
+                        baseline,
+                        options.tolerance if options.check_time else None,
+                        options.memory_tolerance if options.check_memory else None,
+                    )
+                )
+    server.terminate()
+    server.wait()
+
+    if options.update_baselines:
+        if not comparable:
+            baselines = {"settings": settings, "scenarios": baselines["scenarios"]}
+            # the results of other settings are not comparable
+            baselines["scenarios"] = {
+                name: value
+                for name, value in baselines["scenarios"].items()
+                if name in (options.scenario or SCENARIOS)
+            }
+        with open(BASELINES, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if failed or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,8 +5,27 @@ local config = {
         default_project = "SUSE:SLFO:Main",
         default_product = "SUSE:SLFO:Products:SLES:16.0",
     },
+    cache = {
+        enabled = true,
+        -- size budget of the cached responses in bytes
+        max_size = 104857600,
+        -- seconds, 0 does not cache the paths without a ttl entry
+        default_ttl = 0,
+        -- the first matching API path pattern (python regular expression)
+        -- wins, then the longest matching API path prefix
+        ttl = {
+            -- the package listings of the projects only, not the package
+            -- files and downloads (e.g. productcompose files and cpio archives)
+            { pattern = "^/source/[^/]+/?$", seconds = 600 },
+            { prefix = "/search/person", seconds = 86400 },
+            { prefix = "/group/", seconds = 86400 },
+            { prefix = "/search/owner", seconds = 3600 },
+            { prefix = "/search/published/binary", seconds = 3600 },
+        },
+    },
     artifacts = {
         repositories = { "images", "product" },
+        jobs = 8,
         images_pattern = "\\b(kiwi-templates-Minimal|SL-Micro)\\b",
         products_pattern = "\\b(000productcompose:)\\b",
         invalid_extensions = {
@@ -38,6 +57,14 @@ local config = {
             }
         end,
     },
+    reviews = {
+        jobs = 8,
+        prefetch = 3,
+    },
+    prjconf = {
+        ignored_repositories = { "ports" },
+        ignored_codes = { "excluded", "disabled", "unknown" },
+    },
     packages = {
         default_productcomposer = "/000productcompose/default.productcompose",
         get_build_project = function(self)
@@ -49,6 +76,14 @@ local config = {
             return l_productcomposer
         end,
     },
+    publish = {
+        -- watched when a project is given without repositories
+        repositories = { "images" },
+        -- seconds between the polls when the long-poll is not available,
+        -- doubled up to max_interval while nothing changes
+        interval = 30,
+        max_interval = 600,
+    },
 }
 
 return config
@@ -1,13 +1,21 @@
 #!/usr/bin/env python3
 
 from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
 import requests
 
-QUERY = """
-query {{
-  incidents(incidentId:{}) {{
+from sle_package.utils import cassette
+
+# one aliased incidents() lookup per incident, so a chunk of incidents is a single query
+INCIDENT_QUERY = """
+  i{iid}: incidents(incidentId:{iid}) {{
     edges {{
       node {{
+        status {{
+          name
+        }}
         repositories {{
           edges {{
             node {{
@@ -18,28 +26,118 @@ query {{
       }}
     }}
   }}
-}}
 """
 SMELT_API = "https://smelt.suse.de/graphql/"
+CHUNK_SIZE = 25
+JOBS = 4
+# the repositories of released incidents no longer change, they can be cached
+RELEASED_STATUS = "done"
+CACHE_FILE = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+                          "sle_tools", "incident_repos.json")
+
+
+def get_session(jobs=JOBS):
+    session = requests.Session()
+    # records to or replays from the cassette given with --record/--replay
+    adapter = cassette.http_adapter(pool_connections=1, pool_maxsize=jobs)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def load_cache(path=CACHE_FILE):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
 
-def get_incident_repos(iid):
-    query = {"query": QUERY.format(iid)}
-    results = requests.post(SMELT_API, query).json()
+def save_cache(cache, path=CACHE_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = "{}.{}".format(path, os.getpid())
+    with open(tmp_path, "w") as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, path)
 
-    incs_repos = [i["node"]["repositories"]["edges"] for i in results["data"]["incidents"]["edges"]]
-    repos = set()
-    for inc_repos in incs_repos:
-        repos.update({s["node"]["name"] for s in inc_repos})
 
+def query_incidents(session, iids, api=SMELT_API, released_status=RELEASED_STATUS):
+    """
+    Look up a chunk of incidents with a single GraphQL query, returns a dict
+    incident -> (repositories, released).
+    """
+    query = "query {{{}}}".format("".join(INCIDENT_QUERY.format(iid=iid) for iid in iids))
+    response = session.post(api, {"query": query})
+    response.raise_for_status()
+    results = response.json()
+    if results.get("errors"):
+        raise RuntimeError(results["errors"])
+
+    incidents = {}
+    for iid in iids:
+        repos = set()
+        released = False
+        for incident in results["data"]["i{}".format(iid)]["edges"]:
+            repos.update(s["node"]["name"] for s in incident["node"]["repositories"]["edges"])
+            status = incident["node"].get("status") or {}
+            released = status.get("name") == released_status
+        incidents[iid] = (repos, released)
+    return incidents
+
+
+def get_incidents_repos(iids, chunk_size=CHUNK_SIZE, jobs=JOBS, api=SMELT_API, cache=None):
+    """
+    Look up the repositories of many incidents, chunk_size incidents per query
+    and jobs queries at the same time over a pooled session. The released
+    incidents are answered from and added to cache, if given.
+    Returns a dict incident -> set of repositories.
+    """
+    cache = {} if cache is None else cache
+    repos = {iid: set(cache[str(iid)]) for iid in iids if str(iid) in cache}
+    missing = list(dict.fromkeys(iid for iid in iids if iid not in repos))
+    chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+    if not chunks:
+        return repos
+    with get_session(jobs) as session, ThreadPoolExecutor(max_workers=jobs) as executor:
+        for incidents in executor.map(lambda chunk: query_incidents(session, chunk, api), chunks):
+            for iid, (inc_repos, released) in incidents.items():
+                repos[iid] = inc_repos
+                if released:
+                    cache[str(iid)] = sorted(inc_repos)
     return repos
 
+
+def get_incident_repos(iid, api=SMELT_API):
+    return get_incidents_repos([iid], api=api)[iid]
+
+
 if __name__ == "__main__":
     parser = ArgumentParser()
     parser.add_argument("incidents", metavar="incident", help="The incident numbers", nargs="+", type=int)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help="Incidents per query (default: %(default)s)")
+    parser.add_argument("--jobs", type=int, default=JOBS,
+                        help="Queries running at the same time (default: %(default)s)")
+    parser.add_argument("--api", default=SMELT_API,
+                        help="GraphQL endpoint (default: %(default)s)")
+    parser.add_argument("--cache", action="store_true",
+                        help="Keep the repositories of the released incidents in {}".format(CACHE_FILE))
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--record", metavar="DIR",
+                       help="Record the queries and their responses in the cassette DIR")
+    group.add_argument("--replay", metavar="DIR",
+                       help="Answer the queries from the cassette DIR, without network")
     options = parser.parse_args()
+    if options.record or options.replay:
+        cassette.configure(options.record or options.replay, bool(options.record))
 
+    cache = load_cache() if options.cache else None
+    repos = get_incidents_repos(options.incidents, max(options.chunk_size, 1),
+                                max(options.jobs, 1), options.api, cache)
+    if options.cache:
+        save_cache(cache)
 
     for iid in options.incidents:
         print("{}:".format(iid))
-        for repo in get_incident_repos(iid):
+        for repo in repos[iid]:
             print("  * {}".format(repo))
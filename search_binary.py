@@ -1,11 +1,15 @@
 #!/usr/bin/env python3
 
 from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+import json
 import requests
 
-QUERY = """
-query {{
-  binaries(name_Iexact:"{}") {{
+from sle_package.utils import cassette
+
+# one aliased binaries() lookup per binary, so a chunk of binaries is a single query
+BINARY_QUERY = """
+  b{index}: binaries(name_Iexact:{name}) {{
     edges {{
       node {{
         channelsources {{
@@ -26,27 +30,89 @@ query {{
       }}
     }}
   }}
-}}
 """
 SMELT_API = "https://smelt.suse.de/graphql/"
+CHUNK_SIZE = 50
+JOBS = 4
+
+
+def get_session(jobs=JOBS):
+    session = requests.Session()
+    # records to or replays from the cassette given with --record/--replay
+    adapter = cassette.http_adapter(pool_connections=1, pool_maxsize=jobs)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def build_query(binaries):
+    return "query {{{}}}".format(
+        "".join(BINARY_QUERY.format(index=index, name=json.dumps(binary))
+                for index, binary in enumerate(binaries)))
+
+
+def query_binaries(session, binaries, api=SMELT_API):
+    """
+    Look up a chunk of binaries with a single GraphQL query, returns a list
+    of (channel, project, package) per binary.
+    """
+    response = session.post(api, {"query": build_query(binaries)})
+    response.raise_for_status()
+    results = response.json()
+    if results.get("errors"):
+        raise RuntimeError(results["errors"])
+
+    infos = []
+    for index in range(len(binaries)):
+        info = []
+        for bin_result in results["data"]["b{}".format(index)]["edges"]:
+            for result in bin_result["node"]["channelsources"]["edges"]:
+                info.append((result["node"]["channel"]["name"],
+                             result["node"]["project"]["name"],
+                             result["node"]["package"]["name"]))
+        infos.append(info)
+    return infos
+
+
+def get_binaries_info(binaries, chunk_size=CHUNK_SIZE, jobs=JOBS, api=SMELT_API):
+    """
+    Look up many binaries, chunk_size binaries per query and jobs queries at
+    the same time over a pooled session. Yields (binary, results) in the
+    input order, as soon as the chunk of a binary is done.
+    """
+    chunks = [binaries[i:i + chunk_size] for i in range(0, len(binaries), chunk_size)]
+    with get_session(jobs) as session, ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(query_binaries, session, chunk, api) for chunk in chunks]
+        for chunk, future in zip(chunks, futures):
+            yield from zip(chunk, future.result())
+
 
-def get_binary_info(binary):
-    query = {"query": QUERY.format(binary)}
-    results = requests.post(SMELT_API, query).json()
+def get_binary_info(binary, api=SMELT_API):
+    for _, info in get_binaries_info([binary], api=api):
+        yield from info
 
-    for bin_result in results["data"]["binaries"]["edges"]:
-        for result in bin_result["node"]["channelsources"]["edges"]:
-            yield (result["node"]["channel"]["name"],
-                   result["node"]["project"]["name"],
-                   result["node"]["package"]["name"])
 
 if __name__ == "__main__":
     parser = ArgumentParser()
     parser.add_argument("binaries", metavar="binary", help="The binary names", nargs="+")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help="Binaries per query (default: %(default)s)")
+    parser.add_argument("--jobs", type=int, default=JOBS,
+                        help="Queries running at the same time (default: %(default)s)")
+    parser.add_argument("--api", default=SMELT_API,
+                        help="GraphQL endpoint (default: %(default)s)")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--record", metavar="DIR",
+                       help="Record the queries and their responses in the cassette DIR")
+    group.add_argument("--replay", metavar="DIR",
+                       help="Answer the queries from the cassette DIR, without network")
     options = parser.parse_args()
+    if options.record or options.replay:
+        cassette.configure(options.record or options.replay, bool(options.record))
 
 
-    for binary in options.binaries:
+    for binary, info in get_binaries_info(options.binaries, max(options.chunk_size, 1),
+                                          max(options.jobs, 1), options.api):
         print("{}:".format(binary))
-        for chan, proj, pack in  get_binary_info(binary):
-            print(" {}: {}/{}".format(chan, proj,pack))
+        for chan, proj, pack in info:
+            print(" {}: {}/{}".format(chan, proj, pack))
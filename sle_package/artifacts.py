@@ -1,24 +1,21 @@
+import argparse
 import re
+import xml.etree.ElementTree as ET
 from argparse import Namespace
-from rich.progress import Progress, TaskID
-from typing import Any  # If LuaTable import fails, you might temporarily use Any
-
-try:
-    from lupa import LuaTable  # type: ignore
-except ImportError:
-    LuaTable = Any  # Fallback if LuaTable cannot be imported
-
+from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
+from rich.progress import Progress
 
+from sle_package.utils.config import Config, RepoInfo
 from sle_package.utils.logger import logger_setup
-from sle_package.utils.tools import (
-    run_command,
-    run_command_and_stream_output,
-    running_spinner_decorator,
-)
+from sle_package.utils.obs import get_client
+from sle_package.utils.tools import running_spinner_decorator, valid_jobs
 
 
 log = logger_setup(__name__)
 
+MAX_PACKAGE_FILTERS = 100
+
 
 @running_spinner_decorator
 def list_packages(api_url: str, project: str) -> list[str]:
@@ -29,51 +26,97 @@ def list_packages(api_url: str, project: str) -> list[str]:
     :param project: OBS project
     :return: list of source packages
     """
-    command = f"osc -A {api_url} ls {project}"
-    output = run_command(command.split())
-    return output.stdout
+    output = get_client(api_url).get(f"/source/{project}")
+    soup = BeautifulSoup(output, "lxml")
+    return [entry.get("name") for entry in soup.find_all("entry")]
+
+
+def list_repository_binaries(
+    api_url: str, project: str, repository: str, packages: list[str]
+) -> dict[str, list[str]]:
+    """
+    List the binaries of the packages in a repository, for all architectures,
+    with a single request to the binarylist view of the build results
+
+    :param api_url: OBS instance
+    :param project: OBS project
+    :param repository: repository name
+    :param packages: packages to be listed, empty for all packages
+    :return: dict with the binary file names per package
+    """
+    params = [("view", "binarylist"), ("repository", repository)]
+    params.extend(("package", package) for package in packages)
+    binaries: dict[str, dict[str, None]] = {}
+    package = ""
+    stream = get_client(api_url).stream(f"/build/{project}/_result", params=params)
+    try:
+        for event, elem in ET.iterparse(stream, events=("start", "end")):
+            if event == "start" and elem.tag == "binarylist":
+                package = elem.get("package", "")
+            elif event == "end" and elem.tag == "binary":
+                # dict keeps the first seen order without duplicates between archs
+                binaries.setdefault(package, {})[elem.get("filename", "")] = None
+            elif event == "end" and elem.tag in ("binarylist", "result"):
+                elem.clear()
+    finally:
+        stream.close()
+    return {package: list(filenames) for package, filenames in binaries.items()}
 
 
 def list_artifacs(
     api_url: str,
     project: str,
     packages: list[str],
-    repo_info: Any,
-    progress: Progress,
-    task_id: TaskID,
-) -> None:
+    repository: str,
+    pattern: re.Pattern,
+    invalid_start: tuple,
+    invalid_extensions: tuple,
+) -> list[str]:
     """
     List all artifacts filtered by pattern in the specified repoistory
     from a OBS project
 
     :param api_url: OBS instance
     :param project: OBS project
-    :param project: list of source packages
-    :param repo_info: Lua Table with repository info
+    :param packages: list of source packages
+    :param repository: repository name
+    :param pattern: pattern of the packages to be listed
+    :param invalid_start: prefixes of the files to be ignored
+    :param invalid_extensions: extensions of the files to be ignored
+    :return: list of artifacts, in the packages order
+    """
+    matches = [package for package in packages if re.search(pattern, package)]
+    if not matches:
+        return []
+    # too many filters would exceed the URL length, filter in memory instead
+    filters = matches if len(matches) <= MAX_PACKAGE_FILTERS else []
+    binaries = list_repository_binaries(api_url, project, repository, filters)
+    return [
+        line
+        for package in matches
+        for line in binaries.get(package, [])
+        if not line.startswith(invalid_start) and not line.endswith(invalid_extensions)
+    ]
+
+
+def get_repo_filters(repo_info: RepoInfo) -> dict:
+    """
+    Convert the repository info into the filters used by list_artifacs.
+
+    :param repo_info: repository info
+    :return: dict with repository, pattern, invalid_start and invalid_extensions
     """
     log.debug(">> pattern = %s", repo_info.pattern)
     pattern = re.compile(repo_info.pattern)
     log.debug(">> pattern = %s", pattern)
-    # invalid_start = (repo_info.invalid_start, repo_info.name)
-    invalid_start = tuple(
-        str(repo_info.invalid_start[i]) for i in repo_info.invalid_start
-    )
-    invalid_extensions = tuple(
-        str(repo_info.invalid_extensions[i]) for i in repo_info.invalid_extensions
-    )
-
-    for package in packages:
-        if re.search(pattern, package):
-            command = [
-                "/bin/bash",
-                "-c",
-                f"osc -A {api_url} ls {project} {package} -b -r {repo_info.name}",
-            ]
-            for line in run_command_and_stream_output(command):
-                if not line.startswith(tuple(invalid_start)):
-                    if not line.endswith(invalid_extensions):
-                        print(line)
-        progress.update(task_id, advance=1)
+    invalid_start = tuple(repo_info.invalid_start)
+    invalid_extensions = tuple(repo_info.invalid_extensions)
+    return {
+        "repository": repo_info.name,
+        "pattern": pattern,
+        "invalid_start": invalid_start,
+        "invalid_extensions": invalid_extensions,
+    }
 
 
 def build_parser(parent_parser, config) -> None:
@@ -95,10 +138,20 @@ def build_parser(parent_parser, config) -> None:
         type=str,
         default=config.common.default_product,
     )
+    subparser.add_argument(
+        "--jobs",
+        "-j",
+        dest="jobs",
+        help="Number of repositories listed in parallel, one OBS query per "
+        f"repository, so at most {len(config.artifacts.repositories)} "
+        f"(DEFAULT = {config.artifacts.jobs}).",
+        type=valid_jobs,
+        default=config.artifacts.jobs,
+    )
     subparser.set_defaults(func=main)
 
 
-def main(args: Namespace, config: LuaTable) -> None:
+def main(args: Namespace, config: Config) -> None:
     """
     Main method that get the list of all artifacts from a given OBS project
 
@@ -107,23 +160,25 @@ def main(args: Namespace, config: LuaTable) -> None:
     """
     # Parse arguments
     parameters = {"api_url": args.osc_instance, "project": args.project}
-    packages = list_packages(**parameters).split()
+    packages = list_packages(**parameters)
 
     parameters.update(
         {
             "packages": packages,
         }
     )
-    total_steps = len(config.artifacts.repositories) * len(packages)
-    with Progress() as progress:
+    total_steps = len(config.artifacts.repositories)
+    # a single query lists a whole repository, more jobs would stay idle
+    jobs = max(min(args.jobs, len(config.artifacts.repo_infos)), 1)
+    with Progress() as progress, ThreadPoolExecutor(max_workers=jobs) as executor:
         task_id = progress.add_task("Searching artifacts", total=total_steps)
-        for index in config.artifacts.repositories:
-            repo_info = config.artifacts.get_repo_info(config, index)
-            parameters.update(
-                {
-                    "repo_info": repo_info,
-                    "progress": progress,
-                    "task_id": task_id,
-                }
-            )
-            list_artifacs(**parameters)
+        futures = []
+        for repo_info in config.artifacts.repo_infos:
+            parameters.update(get_repo_filters(repo_info))
+            future = executor.submit(list_artifacs, **parameters)
+            future.add_done_callback(lambda _: progress.update(task_id, advance=1))
+            futures.append(future)
+        # print in the per repository/package order, whatever order they finish
+        for future in futures:
+            for line in future.result():
+                print(line)
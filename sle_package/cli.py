@@ -4,25 +4,24 @@ import importlib
 import os
 import sys
 import urllib.error
+from typing import Any, Optional
 
 import argcomplete
-from dotenv import load_dotenv
-from lupa import LuaRuntime  # type: ignore
 
 from sle_package.utils.logger import logger_setup, global_logger_config
 
-# Get the directory of config.lua
-load_dotenv()
-config_dir = os.environ.get("CONFIG_DIR")
-
-# Load the Lua runtime and modify the package path
-# lua = lupa.LuaRuntime()
-lua = LuaRuntime()
-lua.execute(f'package.path = package.path .. ";{config_dir}/?.lua"')
-
-# Now you can require "config" (without the full path)
-# it will return a tuple: lua table and full path to config file
-config, _ = lua.require("config")
+# Subprograms and their help. The module of a subprogram is only imported,
+# and the configuration only loaded, when the subprogram is used.
+SUBCOMMANDS = {
+    "artifacts": "Return the list of artifacts from a OBS project.",
+    "requests": "List all requests accepted or deleted in a given time.",
+    "reviews": "Review submit, delete and bugowner requests.",
+    "packages": "Return OBS information for the given binary package.",
+    "users": "Search in OBS information for the given user/group.",
+    "prjconf": "Return the prjconf onlybuild flags of a OBS project.",
+    "packagelist": "Report the package movements between 2 package lists.",
+    "publish": "Wait for the publication of OBS projects.",
+}
 
 PARSER = argparse.ArgumentParser(description="Release management tools.")
 PARSER.add_argument(
@@ -34,36 +33,175 @@ PARSER.add_argument(
     "--osc-instance",
     dest="osc_instance",
     help="The URL of the API from the Open Buildservice instance that should be used.",
-    default=config.common.api_url,
+)
+PARSER.add_argument(
+    "--no-cache",
+    dest="no_cache",
+    action="store_true",
+    help="Do not use the on-disk cache of the OBS responses.",
+)
+PARSER.add_argument(
+    "--refresh",
+    dest="refresh",
+    action="store_true",
+    help="Revalidate the cached OBS responses even if they did not expire.",
+)
+PARSER.add_argument(
+    "--profile",
+    dest="profile",
+    action="store_true",
+    help="Print the time spent in the OBS requests, cache hits and phases at exit.",
+)
+PARSER.add_argument(
+    "--profile-trace",
+    dest="profile_trace",
+    metavar="FILE",
+    help="Write the profile as a Chrome trace (JSON) to FILE, implies --profile.",
+)
+CASSETTE_GROUP = PARSER.add_mutually_exclusive_group()
+CASSETTE_GROUP.add_argument(
+    "--record",
+    dest="record",
+    metavar="DIR",
+    help="Record the OBS requests of the run and their responses "
+    "in the cassette DIR, replacing it, implies --no-cache.",
+)
+CASSETTE_GROUP.add_argument(
+    "--replay",
+    dest="replay",
+    metavar="DIR",
+    help="Serve the OBS requests from the cassette DIR recorded "
+    "with --record, without network, implies --no-cache.",
 )
 SUBPARSERS = PARSER.add_subparsers(
     help="Help for the subprograms that this tool offers."
 )
 
-global_logger_config(verbose=config.common.debug)
 log = logger_setup(__name__)
 
 
-def import_sle_module(name: str) -> None:
+def load_config() -> Any:
+    """
+    Load config.lua from CONFIG_DIR, through its compiled snapshot.
+
+    :return: configuration, exits if it can not be loaded
+    """
+    from dotenv import load_dotenv
+
+    from sle_package.utils.config import load_config as load_config_snapshot
+
+    # Get the directory of config.lua
+    load_dotenv()
+    config_dir = os.environ.get("CONFIG_DIR") or "."
+    try:
+        return load_config_snapshot(config_dir)
+    except (OSError, RuntimeError) as e:
+        log.error(e)
+        sys.exit(1)
+
+
+def get_argv() -> list[str]:
+    """
+    Return the command line arguments, also while argcomplete is completing.
+
+    :return: arguments without the program name
+    """
+    if "_ARGCOMPLETE" in os.environ:
+        comp_line = os.environ.get("COMP_LINE", "")
+        comp_point = int(os.environ.get("COMP_POINT", len(comp_line)))
+        return comp_line[:comp_point].split()[1:]
+    return sys.argv[1:]
+
+
+def find_subcommand(argv: list[str]) -> Optional[str]:
+    """
+    Find the subprogram selected in the command line arguments.
+
+    :param argv: arguments without the program name
+    :return: subprogram name or None
+    """
+    # global options followed by a value, e.g. --record DIR
+    value_options = {
+        option
+        for action in PARSER._actions
+        if action.nargs != 0
+        for option in action.option_strings
+    }
+    args = iter(argv)
+    for arg in args:
+        if arg in value_options:
+            next(args, None)
+        elif not arg.startswith("-"):
+            # the first positional argument selects the subprogram
+            return arg if arg in SUBCOMMANDS else None
+    return None
+
+
+def import_sle_module(name: str, config: Any) -> None:
     """
     Imports a module
 
     :param name: Module in the sle_package package.
+    :param config: Lua config table
     """
     module = importlib.import_module(f".{name}", package="sle_package")
     module.build_parser(SUBPARSERS, config)
 
 
+def report_profile(args: argparse.Namespace) -> None:
+    """
+    Print the profile summary and write the trace, if the run is profiled.
+
+    :param args: Argparse Namespace that has all the arguments
+    """
+    from sle_package.utils import profiler
+
+    run_profiler = profiler.get_profiler()
+    if run_profiler is None:
+        return
+    run_profiler.print_summary()
+    if args.profile_trace:
+        try:
+            run_profiler.write_trace(args.profile_trace)
+        except OSError as e:
+            log.error("Failed to write the profile trace: %s", e)
+
+
 def main() -> None:
-    module_list = ["artifacts", "requests", "reviews", "packages", "users"]
-    for module in module_list:
-        import_sle_module(module)
+    subcommand = find_subcommand(get_argv())
+    config = None
+    for name, help_text in SUBCOMMANDS.items():
+        if name == subcommand:
+            config = load_config()
+            import_sle_module(name, config)
+        else:
+            # lightweight placeholder, enough for the help and completion
+            SUBPARSERS.add_parser(name, help=help_text)
     argcomplete.autocomplete(PARSER)
     args = PARSER.parse_args()
     if "func" in vars(args):
+        from sle_package.utils import cassette, obs, profiler
+        from sle_package.utils.cache import build_cache
+
+        global_logger_config(verbose=config.common.debug)
+        if args.profile or args.profile_trace:
+            profiler.enable()
+        if not args.osc_instance:
+            args.osc_instance = config.common.api_url
+        if args.record or args.replay:
+            try:
+                cassette.configure(args.record or args.replay, bool(args.record))
+            except RuntimeError as e:
+                log.error(e)
+                sys.exit(1)
+            # every request must go through the cassette
+            args.no_cache = True
+        cache = None if args.no_cache else build_cache(config.cache)
+        obs.configure(args.osc_config, cache, args.refresh)
         # Run a subprogramm only if the parser detected it correctly.
         try:
-            args.func(args, config)
+            with profiler.phase(subcommand or "main"):
+                args.func(args, config)
         except urllib.error.URLError as url_error:
             if "name or service not known" in str(url_error).lower():
                 log.error(
@@ -72,6 +210,9 @@ def main() -> None:
                     "the program!"
                 )
                 sys.exit(1)
+        finally:
+            report_profile(args)
+            cassette.configure(None)
         return
     PARSER.print_help()
     sys.exit(1)
@@ -0,0 +1,162 @@
+import json
+import sys
+import textwrap
+from typing import Optional
+
+import yaml
+
+from sle_package.utils.tools import YamlLoader
+
+
+WRAP_WIDTH = 90
+
+# package -> comma separated groups, most packages are in a single group so a
+# shared (interned) string is much smaller than a list per package
+PackageGroups = dict[str, str]
+
+
+def parse_summary_txt(content: str) -> PackageGroups:
+    """
+    Parse a summary-staging.txt file, with one "package:group" per line.
+
+    :param content: file content
+    :return: dict package -> groups
+    """
+    groups: PackageGroups = {}
+    for line in content.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        pkg, group = line.split(":")
+        previous = groups.get(pkg)
+        if previous is None:
+            groups[sys.intern(pkg)] = sys.intern(group)
+        else:
+            groups[pkg] = sys.intern(f"{previous},{group}")
+    return groups
+
+
+def parse_summary_yml(content: str, unsorted: bool = False) -> PackageGroups:
+    """
+    Parse a reference-summary.yml like file, with the packages per module.
+
+    :param content: file content
+    :param unsorted: use the "unsorted" group instead of the module
+    :return: dict package -> groups
+    """
+    groups: PackageGroups = {}
+    for module, packages in (yaml.load(content, Loader=YamlLoader) or {}).items():
+        group = sys.intern("unsorted" if unsorted else str(module))
+        for package in packages or []:
+            groups[sys.intern(str(package))] = group
+    return groups
+
+
+def format_summary(groups: PackageGroups) -> str:
+    """
+    Format package groups back to the summary-staging.txt format, sorted.
+
+    :param groups: dict package -> groups
+    :return: file content
+    """
+    lines = sorted(
+        f"{pkg}:{group}"
+        for pkg, pkg_groups in groups.items()
+        for group in pkg_groups.split(",")
+    )
+    return "".join(f"{line}\n" for line in lines)
+
+
+def calculate_diff(old: PackageGroups, new: PackageGroups) -> Optional[dict]:
+    """
+    Calculate the package movements between 2 package groups in a single
+    pass over the sorted packages, the inputs are not modified.
+
+    :param old: origin package groups
+    :param new: target package groups
+    :return: dict with "removed" {groups: packages}, "moved" {(from groups,
+             to groups): packages} and "added" {groups: packages}, or None if
+             there is no difference
+    """
+    removed: dict[str, list[str]] = {}
+    moved: dict[tuple[str, str], list[str]] = {}
+    added: dict[str, list[str]] = {}
+    for pkg in sorted(old.keys() | new.keys()):
+        old_groups = old.get(pkg)
+        new_groups = new.get(pkg)
+        if old_groups == new_groups:
+            continue
+        if new_groups is None:
+            removed.setdefault(old_groups, []).append(pkg)  # type: ignore
+        elif old_groups is None:
+            added.setdefault(new_groups, []).append(pkg)
+        else:
+            moved.setdefault((old_groups, new_groups), []).append(pkg)
+    if not removed and not moved and not added:
+        return None
+    return {"removed": removed, "moved": moved, "added": added}
+
+
+def _wrap(packages: list[str]) -> str:
+    paragraph = ", ".join(packages)
+    return "   " + "\n".join(
+        textwrap.wrap(
+            paragraph,
+            width=WRAP_WIDTH,
+            break_long_words=False,
+            break_on_hyphens=False,
+        )
+    )
+
+
+def format_text(diff: Optional[dict]) -> Optional[str]:
+    """
+    Format the package movements as the wrapped text report.
+
+    :param diff: result of calculate_diff
+    :return: report or None if there is no difference
+    """
+    if not diff:
+        return None
+    buffer = []
+    for groups in sorted(diff["removed"]):
+        buffer.append(f"* Remove from {groups}")
+        buffer.append(_wrap(diff["removed"][groups]))
+    for old_groups, new_groups in sorted(
+        diff["moved"], key=lambda move: f"{move[0]} to {move[1]}"
+    ):
+        buffer.append(f"* Move from {old_groups} to {new_groups}")
+        buffer.append(_wrap(diff["moved"][(old_groups, new_groups)]))
+    for groups in sorted(diff["added"]):
+        buffer.append(f"* Add to {groups}")
+        buffer.append(_wrap(diff["added"][groups]))
+    return "\n".join(buffer).strip()
+
+
+def format_json(diff: Optional[dict]) -> str:
+    """
+    Format the package movements as JSON.
+
+    :param diff: result of calculate_diff
+    :return: JSON document
+    """
+    diff = diff or {"removed": {}, "moved": {}, "added": {}}
+    document = {
+        "removed": [
+            {"groups": groups.split(","), "packages": packages}
+            for groups, packages in sorted(diff["removed"].items())
+        ],
+        "moved": [
+            {
+                "from": old_groups.split(","),
+                "to": new_groups.split(","),
+                "packages": packages,
+            }
+            for (old_groups, new_groups), packages in sorted(diff["moved"].items())
+        ],
+        "added": [
+            {"groups": groups.split(","), "packages": packages}
+            for groups, packages in sorted(diff["added"].items())
+        ],
+    }
+    return json.dumps(document, indent=2)
@@ -0,0 +1,225 @@
+import yaml
+from argparse import Namespace
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from sle_package.groupdiff import (
+    PackageGroups,
+    calculate_diff,
+    format_json,
+    format_text,
+    parse_summary_txt,
+    parse_summary_yml,
+)
+from sle_package.utils.logger import logger_setup
+from sle_package.utils.obs import ObsApiError, get_client
+from sle_package.utils.store import get_store, is_pinned, source_key
+from sle_package.utils.tools import parse_cpio, running_spinner_decorator
+
+
+log = logger_setup(__name__)
+
+SUMMARY_FILE = "summary-staging.txt"
+YAML_FILES = ["reference-summary.yml", "reference-unsorted.yml", "unneeded.yml"]
+
+
+def get_package_files(
+    api_url: str, project: str, package: str, revision: str = ""
+) -> dict[str, bytes]:
+    """
+    Get all the source files of a package with a single cpio download, the
+    files of pinned revisions are kept in the content store.
+
+    :param api_url: OBS instance
+    :param project: OBS project
+    :param package: OBS package
+    :param revision: package revision, latest if empty
+    :return: dict file name -> content
+    """
+    store = get_store()
+    files_key = source_key(api_url, project, package, "", revision)
+    if is_pinned(revision):
+        filenames = store.get_object(files_key, "files")
+        if filenames is not None:
+            files = {
+                filename: store.get(
+                    source_key(api_url, project, package, filename, revision)
+                )
+                for filename in filenames
+            }
+            if all(content is not None for content in files.values()):
+                log.debug(">> stored %s", files_key)
+                return files  # type: ignore
+    params = {"view": "cpio"}
+    if revision:
+        params["rev"] = revision
+    archive = get_client(api_url).fetch(f"/source/{project}/{package}", params=params)
+    try:
+        files = parse_cpio(archive)
+    except ValueError as e:
+        raise RuntimeError(f"Invalid cpio archive of {project}/{package}: {e}") from e
+    if is_pinned(revision):
+        for filename, content in files.items():
+            store.put(
+                source_key(api_url, project, package, filename, revision), content
+            )
+        store.put_object(files_key, list(files), "files")
+    return files
+
+
+def get_package_groups(
+    api_url: str, project: str, package: str, revision: str = ""
+) -> PackageGroups:
+    """
+    Get the package groups from summary-staging.txt, or from the reference
+    yaml files when it does not exist. The groups of pinned revisions are
+    kept in the content store.
+
+    :param api_url: OBS instance
+    :param project: OBS project
+    :param package: OBS package, e.g. 000package-groups
+    :param revision: package revision, latest if empty
+    :return: dict package -> groups
+    """
+    groups_key = source_key(api_url, project, package, "", revision)
+    if is_pinned(revision):
+        groups = get_store().get_object(groups_key, "groups")
+        if groups is not None:
+            return groups
+    groups = read_package_groups(api_url, project, package, revision)
+    if is_pinned(revision):
+        get_store().put_object(groups_key, groups, "groups")
+    return groups
+
+
+def read_package_groups(
+    api_url: str, project: str, package: str, revision: str = ""
+) -> PackageGroups:
+    """
+    Download and parse the package groups, see get_package_groups.
+    """
+    try:
+        files = get_package_files(api_url, project, package, revision)
+    except ObsApiError as e:
+        raise RuntimeError(f"{project}/{package} not found: {e}") from e
+    if SUMMARY_FILE in files:
+        return parse_summary_txt(files[SUMMARY_FILE].decode("utf-8"))
+    log.debug("Failed to get %s, trying yaml files", SUMMARY_FILE)
+    groups: PackageGroups = {}
+    for filename in YAML_FILES:
+        if filename not in files:
+            raise RuntimeError(f"{filename} not found in {project}/{package}.")
+        try:
+            content = files[filename].decode("utf-8")
+            groups.update(parse_summary_yml(content, filename != YAML_FILES[0]))
+        except yaml.YAMLError as e:
+            raise RuntimeError(f"Invalid {filename} in {project}/{package}: {e}") from e
+    return groups
+
+
+@running_spinner_decorator
+def get_packages_groups(
+    api_url: str, packages: list[tuple[str, str, str]]
+) -> list[PackageGroups]:
+    """
+    Get the package groups of several packages in parallel.
+
+    :param api_url: OBS instance
+    :param packages: list of (project, package, revision)
+    :return: list of dict package -> groups, in the same order
+    """
+    with ThreadPoolExecutor(max_workers=len(packages)) as executor:
+        futures = [
+            executor.submit(get_package_groups, api_url, *package)
+            for package in packages
+        ]
+        return [future.result() for future in futures]
+
+
+def build_parser(parent_parser, config) -> None:
+    """
+    Builds the parser for this script. This is executed by the main CLI
+    dynamically.
+
+    :param config: Lua config table
+    :return: The subparsers object from argparse.
+    """
+    subparser = parent_parser.add_parser(
+        "packagelist", help="Report the package movements between 2 package lists."
+    )
+    subparser.add_argument(
+        "--from-project",
+        "-f",
+        dest="from_project",
+        help="Origin OBS/IBS project.",
+        type=str,
+        required=True,
+    )
+    subparser.add_argument(
+        "--to-project",
+        "-t",
+        dest="to_project",
+        help="Target OBS/IBS project (DEFAULT = origin project).",
+        type=str,
+    )
+    subparser.add_argument(
+        "--from-package",
+        dest="from_package",
+        help="Origin package (DEFAULT = 000package-groups).",
+        type=str,
+        default="000package-groups",
+    )
+    subparser.add_argument(
+        "--to-package",
+        dest="to_package",
+        help="Target package, e.g. 000product (DEFAULT = 000package-groups).",
+        type=str,
+        default="000package-groups",
+    )
+    subparser.add_argument(
+        "--from-revision",
+        dest="from_revision",
+        help="Origin revision number.",
+        type=str,
+        default="",
+    )
+    subparser.add_argument(
+        "--to-revision",
+        dest="to_revision",
+        help="Target revision number.",
+        type=str,
+        default="",
+    )
+    subparser.add_argument(
+        "--format",
+        dest="output_format",
+        help="Output format (DEFAULT = text).",
+        choices=["text", "json"],
+        default="text",
+    )
+    subparser.set_defaults(func=main)
+
+
+def main(args: Namespace, config: Any) -> None:
+    """
+    Main method that report the package movements between 2 package lists
+
+    :param args: Argparse Namespace that has all the arguments
+    :param config: Lua config table
+    """
+    packages = [
+        (args.from_project, args.from_package, args.from_revision),
+        (args.to_project or args.from_project, args.to_package, args.to_revision),
+    ]
+    try:
+        old, new = get_packages_groups(args.osc_instance, packages)
+    except RuntimeError as e:
+        log.error(e)
+        return
+    diff = calculate_diff(old, new)
+    if args.output_format == "json":
+        print(format_json(diff))
+    elif diff:
+        print(format_text(diff))
+    else:
+        print("No package movement reported")
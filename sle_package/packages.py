@@ -1,36 +1,144 @@
-import re
+import functools
+import yaml
 from bs4 import BeautifulSoup
 from rich.console import Console
 from rich.table import Table
-from subprocess import CalledProcessError
 
-from sle_package.users import get_groups, get_users
+from sle_package.users import get_groups, get_users, resolve_users
 from sle_package.utils.logger import logger_setup
+from sle_package.utils.obs import ObsApiError, get_client
 from sle_package.utils.tools import (
-    run_command,
-    run_command_and_stream_output,
+    YamlLoader,
+    memoize,
     running_spinner_decorator,
 )
 
 
 log = logger_setup(__name__)
 
+# package set of the product, the other sets are only shipped through it or
+# when they are unpacked
+MAIN_PACKAGESET = "main"
 
+
+def resolve_packagesets(
+    packagesets: list[dict], flavor: str, arch: str
+) -> dict[str, set[str]]:
+    """
+    Resolve the package sets of a productcompose file for a flavor and an
+    architecture, like productcomposer does: the sets are evaluated in order,
+    a set whose flavors or architectures do not match is empty, and the
+    add, sub and intersect operations use the sets defined before.
+
+    :param packagesets: packagesets of the productcompose file
+    :param flavor: flavor name, empty if the file has no flavors
+    :param arch: architecture
+    :return: dict package set name -> binary names
+    """
+    sets: dict[str, set[str]] = {}
+    for packageset in packagesets:
+        name = str(packageset.get("name", MAIN_PACKAGESET))
+        sets[name] = set()
+        if "flavors" in packageset and flavor not in packageset["flavors"]:
+            continue
+        if "architectures" in packageset and arch not in packageset["architectures"]:
+            continue
+        # entries can have version constraints, e.g. "foo >= 1.0"
+        packages = {str(entry).split()[0] for entry in packageset.get("packages") or []}
+        for operation in ["add", "sub", "intersect"]:
+            for other in packageset.get(operation) or []:
+                if other not in sets:
+                    raise RuntimeError(
+                        f"Invalid productcompose file: package set {other} used "
+                        f"by {name} is not defined before it"
+                    )
+                if operation == "add":
+                    packages |= sets[other]
+                elif operation == "sub":
+                    packages -= sets[other]
+                else:
+                    packages &= sets[other]
+        sets[name] = packages
+    return sets
+
+
+def index_productcomposer(content: str) -> dict[str, set[tuple[str, str]]]:
+    """
+    Index the packages of a productcompose file by the flavors and
+    architectures they are shipped on, in the main package set or in the
+    unpacked ones.
+
+    :param content: productcompose YAML
+    :return: dict binary name -> set of (flavor, architecture)
+    """
+    try:
+        composer = yaml.load(content, Loader=YamlLoader) or {}
+    except yaml.YAMLError as e:
+        raise RuntimeError(f"Invalid productcompose file: {e}") from e
+    # the architectures of a flavor override the top-level ones
+    architectures = composer.get("architectures") or []
+    flavors = {
+        str(name): [
+            str(arch) for arch in (flavor or {}).get("architectures") or architectures
+        ]
+        for name, flavor in (composer.get("flavors") or {}).items()
+    }
+    if not flavors:
+        flavors = {"": [str(arch) for arch in architectures]}
+    packagesets = composer.get("packagesets") or []
+    setnames = [MAIN_PACKAGESET] + [str(name) for name in composer.get("unpack") or []]
+    index: dict[str, set[tuple[str, str]]] = {}
+    for flavor, archs in flavors.items():
+        for arch in archs:
+            sets = resolve_packagesets(packagesets, flavor, arch)
+            for setname in setnames:
+                for name in sets.get(setname, set()):
+                    index.setdefault(name, set()).add((flavor, arch))
+    return index
+
+
+@functools.cache
 @running_spinner_decorator
+def load_productcomposer(
+    api_url: str, productcomposer: str
+) -> dict[str, set[tuple[str, str]]]:
+    """
+    Download and index the productcompose file, once per run.
+
+    :param api_url: OBS instance
+    :param productcomposer: project/package/file of the productcompose
+    :return: dict binary name -> set of (flavor, architecture)
+    """
+    return index_productcomposer(get_client(api_url).get(f"/source/{productcomposer}"))
+
+
+def get_shipping_info(
+    api_url: str, package: str, productcomposer: str
+) -> list[tuple[str, str]]:
+    """
+    Return where a binary is shipped according to the productcompose file.
+
+    :param api_url: OBS instance
+    :param package: binary name
+    :param productcomposer: project/package/file of the productcompose
+    :return: sorted list of (flavor, architecture), empty if not shipped
+    """
+    return sorted(load_productcomposer(api_url, productcomposer).get(package, []))
+
+
 def is_shipped(api_url: str, package: str, productcomposer: str) -> bool:
-    command = [
-        "/bin/bash",
-        "-c",
-        f"osc -A {api_url} cat {productcomposer}",
-    ]
-    pattern = r"\b" + re.escape(package) + r"\b"
-    for line in run_command_and_stream_output(command):
-        if re.search(pattern, line):
-            log.debug(line)
-            return True
-    return False
+    """
+    Check if a binary is shipped according to the productcompose file.
+
+    :param api_url: OBS instance
+    :param package: binary name
+    :param productcomposer: project/package/file of the productcompose
+    :return: True if it is in any package set
+    """
+    return package in load_productcomposer(api_url, productcomposer)
 
 
+@memoize
 @running_spinner_decorator
 def get_source_package(api_url: str, project: str, package: str) -> str:
     """
@@ -41,19 +149,21 @@ def get_source_package(api_url: str, project: str, package: str) -> str:
     :param package: binary name
     :return: source package
     """
-    command = f"osc -A {api_url} bse {package}"
-    output = run_command(command.split())
+    output = get_client(api_url).get(
+        "/search/published/binary/id", params={"match": f"@name='{package}'"}
+    )
+    soup = BeautifulSoup(output, "lxml")
     filtered_output = [
-        line for line in output.stdout.splitlines() if line.startswith(f"{project} ")
+        binary
+        for binary in soup.find_all("binary")
+        if binary.get("project") == project and binary.get("package")
     ]
     if len(filtered_output) == 0:
         raise RuntimeError(f"No source package found for {package} in {project}.")
     packages = []
-    for line in filtered_output:
-        items = line.split()
-        item = items[1].split(":")
-        if len(item) > 0:
-            packages.append(item[0])
+    for binary in filtered_output:
+        # multibuild flavors are reported as package:flavor
+        packages.append(binary.get("package").split(":")[0])
     source_package = set(packages)
     if len(source_package) != 1:
         log.debug(
@@ -65,6 +175,7 @@ def get_source_package(api_url: str, project: str, package: str) -> str:
     return str(next(iter(source_package)))
 
 
+@memoize
 @running_spinner_decorator
 def get_bugowner(api_url: str, package: str) -> tuple[list, bool]:
     """
@@ -75,13 +186,13 @@ def get_bugowner(api_url: str, package: str) -> tuple[list, bool]:
     :param package: binary name
     :return: source package
     """
-    fixed_package = package.replace("++", "%2B%2B")
-    command = f"osc -A {api_url} api /search/owner?package={fixed_package}&filter=bugowner"
     bugowners = []
     is_group = False
     try:
-        output = run_command(command.split())
-        soup = BeautifulSoup(output.stdout, "lxml")
+        output = get_client(api_url).get(
+            "/search/owner", params={"package": package, "filter": "bugowner"}
+        )
+        soup = BeautifulSoup(output, "lxml")
         people = soup.find_all("person")
         if len(people) != 0:
             bugowners = [person.get("name") for person in people]
@@ -95,10 +206,11 @@ def get_bugowner(api_url: str, package: str) -> tuple[list, bool]:
 
         log.debug("No bugowner found for %s.", package)
         return bugowners, is_group
-    except CalledProcessError as e:
+    except ObsApiError as e:
         raise RuntimeError(f"{package} has no bugowner") from e
 
 
+@memoize
 def get_bugowner_info(api_url: str, user: str, is_group: bool) -> dict:
     """
     Given a source package return the OBS user of the bugowner"
@@ -112,10 +224,34 @@ def get_bugowner_info(api_url: str, user: str, is_group: bool) -> dict:
         if is_group:
             return get_groups(api_url, user)
         return next(get_users(api_url, user))
-    except CalledProcessError as e:
+    except ObsApiError as e:
         raise RuntimeError(f"{user} not found.") from e
 
 
+def get_bugowners_info(api_url: str, users: list[str], is_group: bool) -> list[dict]:
+    """
+    Given the bugowners of a package return their OBS info through
+    get_bugowner_info, the users it has not looked up yet are resolved with a
+    single search first.
+
+    :param api_url: OBS instance
+    :param users: OBS users or groups
+    :param is_group: the bugowners are groups
+    :return: list of OBS user or group info
+    """
+    missing = [
+        user
+        for user in users
+        if not get_bugowner_info.is_cached(api_url, user, is_group)
+    ]
+    if not is_group and len(missing) > 1:
+        for user, people in resolve_users(api_url, missing):
+            # the users not found are looked up again, to report them
+            if people:
+                get_bugowner_info.cache_put(people[0], api_url, user, is_group)
+    return [get_bugowner_info(api_url, user, is_group) for user in users]
+
+
 def build_parser(parent_parser, config) -> None:
     """
     Builds the parser for this script. This is executed by the main CLI
@@ -160,26 +296,30 @@ def main(args, config) -> None:
         try:
             table = Table(title=binary, show_header=False)
             if args.project == config.common.default_project:
-                build_project = config.packages.get_build_project(config)
+                build_project = config.packages.build_project
             else:
                 build_project = f"{args.project}:Build"
             source_package = get_source_package(
                 args.osc_instance, build_project, binary
             )
             table.add_row("Source package", source_package)
-            if is_shipped(
-                args.osc_instance,
-                binary,
-                config.packages.get_productcomposer(config),
-            ):
+            productcomposer = config.packages.productcomposer
+            if is_shipped(args.osc_instance, binary, productcomposer):
                 table.add_row("Shipped", f"YES - {args.product}")
+                shipping_info = get_shipping_info(
+                    args.osc_instance, binary, productcomposer
+                )
+                table.add_row(
+                    "Flavors",
+                    ", ".join(
+                        "/".join(filter(None, target)) for target in shipping_info
+                    ),
+                )
             else:
                 table.add_row("Shipped", "*** NO ***")
             bugowners, is_group = get_bugowner(args.osc_instance, source_package)
-            for bugowner in bugowners:
-                for key, value in get_bugowner_info(
-                    args.osc_instance, bugowner, is_group
-                ).items():
+            for info in get_bugowners_info(args.osc_instance, bugowners, is_group):
+                for key, value in info.items():
                     log.debug("%s: %s", key, value)
                     table.add_row(key, str(value))
             console.print(table)
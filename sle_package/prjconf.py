@@ -0,0 +1,154 @@
+import xml.etree.ElementTree as ET
+from argparse import Namespace
+from typing import Any, Generator
+
+from sle_package.artifacts import list_packages
+from sle_package.utils.logger import logger_setup
+from sle_package.utils.obs import get_client
+from sle_package.utils.tools import running_spinner_decorator
+
+
+log = logger_setup(__name__)
+
+
+def iter_build_results(
+    api_url: str, project: str
+) -> Generator[tuple[str, str, str, str], None, None]:
+    """
+    Stream the build results of a OBS project, without keeping the parsed
+    document in memory.
+
+    :param api_url: OBS instance
+    :param project: OBS project
+    :return: generator of (repository, arch, package, code)
+    """
+    stream = get_client(api_url).stream(f"/build/{project}/_result")
+    try:
+        context = ET.iterparse(stream, events=("start", "end"))
+        _, root = next(context)
+        repository = arch = ""
+        for event, elem in context:
+            if event == "start" and elem.tag == "result":
+                repository = elem.get("repository", "")
+                arch = elem.get("arch", "")
+            elif event == "end" and elem.tag == "status":
+                yield repository, arch, elem.get("package", ""), elem.get("code", "")
+            elif event == "end" and elem.tag == "result":
+                # drop the processed repository/arch results
+                root.clear()
+    finally:
+        stream.close()
+
+
+def list_staging_packages(api_url: str, project: str) -> list[str]:
+    """
+    List the built packages of a staging project, including the multibuild
+    flavors (pkg:flavor) of its source packages.
+
+    :param api_url: OBS instance
+    :param project: OBS staging project
+    :return: sorted list of packages
+    """
+    staging_packages = set(list_packages(api_url, project))
+    project_packages = set()
+    for _, _, package, _ in iter_build_results(api_url, project):
+        if package.split(":", 1)[0] in staging_packages:
+            project_packages.add(package)
+    return sorted(project_packages)
+
+
+@running_spinner_decorator
+def list_repository_packages(
+    api_url: str, project: str, ignored_repositories: set, ignored_codes: set
+) -> dict[str, list[str]]:
+    """
+    List the packages built in each repository of a OBS project.
+
+    :param api_url: OBS instance
+    :param project: OBS project
+    :param ignored_repositories: repositories to be skipped
+    :param ignored_codes: build result codes of the packages to be skipped
+    :return: dict repository -> sorted list of packages
+    """
+    repositories: dict[str, set[str]] = {}
+    for repository, _, package, code in iter_build_results(api_url, project):
+        if repository in ignored_repositories:
+            continue
+        packages = repositories.setdefault(repository, set())
+        if code not in ignored_codes:
+            packages.add(package)
+    return {
+        repository: sorted(packages) for repository, packages in repositories.items()
+    }
+
+
+def format_onlybuild(packages: list[str]) -> list[str]:
+    """
+    Format the prjconf onlybuild flags of packages.
+
+    :param packages: list of packages
+    :return: prjconf lines
+    """
+    return [f"BuildFlags: onlybuild:{package}" for package in packages]
+
+
+def build_parser(parent_parser, config) -> None:
+    """
+    Builds the parser for this script. This is executed by the main CLI
+    dynamically.
+
+    :param config: Lua config table
+    :return: The subparsers object from argparse.
+    """
+    subparser = parent_parser.add_parser(
+        "prjconf", help="Return the prjconf onlybuild flags of a OBS project."
+    )
+    subparser.add_argument(
+        "--project",
+        "-p",
+        dest="project",
+        help=f"OBS/IBS project (DEFAULT = {config.common.default_project}).",
+        type=str,
+        default=config.common.default_project,
+    )
+    # Mutually exclusive group within the subparser
+    group = subparser.add_mutually_exclusive_group(required=True)
+    group.add_argument(
+        "--staging",
+        "-s",
+        action="store_true",
+        help="Staging packages, e.g. for Devel:ReleaseManagement:StagingTest.",
+    )
+    group.add_argument(
+        "--repositories",
+        "-r",
+        action="store_true",
+        help="Built packages per repository.",
+    )
+    subparser.set_defaults(func=main)
+
+
+def main(args: Namespace, config: Any) -> None:
+    """
+    Main method that get the prjconf onlybuild flags from a given OBS project
+
+    :param args: Argparse Namespace that has all the arguments
+    :param config: Lua config table
+    """
+    if args.staging:
+        packages = list_staging_packages(args.osc_instance, args.project)
+        print("\n".join(format_onlybuild(packages)))
+        return
+
+    repositories = list_repository_packages(
+        args.osc_instance,
+        args.project,
+        set(config.prjconf.ignored_repositories),
+        set(config.prjconf.ignored_codes),
+    )
+    lines = []
+    for repository, packages in repositories.items():
+        lines.append(f'%if "%_repository" == "{repository}"')
+        lines.extend(format_onlybuild(packages))
+        lines.append("%endif\n")
+    print("\n".join(lines))
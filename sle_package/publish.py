@@ -0,0 +1,405 @@
+import argparse
+import datetime
+import queue
+import random
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+from argparse import Namespace
+from typing import Optional
+
+from sle_package.utils.config import Config
+from sle_package.utils.logger import logger_setup
+from sle_package.utils.obs import ObsApiError, get_client
+
+
+log = logger_setup(__name__)
+
+# exit codes of publish wait
+EXIT_PUBLISHED = 0
+EXIT_FAILED = 1
+EXIT_NOT_PUBLISHABLE = 3
+EXIT_TIMEOUT = 124
+EXIT_INTERRUPTED = 130
+
+# seconds a long-poll is held before it is sent again
+LONG_POLL_TIMEOUT = 300
+# an unchanged state returned faster than this was not held by OBS
+LONG_POLL_MIN_WAIT = 2
+# unchanged states in a row not held by OBS before polling instead, the
+# instance does not support the long-poll
+LONG_POLL_FALLBACK = 3
+# polls before the long-poll is tried again
+LONG_POLL_RETRY = 10
+# repository states that do not end published without a change of the project
+NOT_PUBLISHABLE_STATES = {"broken", "unpublished"}
+
+
+def valid_target(target: str) -> tuple[str, list[str]]:
+    """
+    Validate a PROJECT[/REPOSITORY[,REPOSITORY...]] target to be used in argparse
+
+    :param target: target to check
+    :return: project and repositories, empty for the default repositories
+    """
+    project, separator, repositories = target.partition("/")
+    names = [name for name in repositories.split(",") if name]
+    if not project or (separator and not names):
+        msg = f"Not a valid target: '{target}'. Use PROJECT[/REPOSITORY[,...]]."
+        raise argparse.ArgumentTypeError(msg)
+    return project, names
+
+
+def valid_seconds(seconds: str) -> int:
+    """
+    Validate if the number of seconds is a positive number to be used in argparse
+    """
+    try:
+        if int(seconds) < 0:
+            msg = "Seconds must be a positive number."
+            raise argparse.ArgumentTypeError(msg)
+        return int(seconds)
+    except ValueError as exc:
+        msg = f"Not valid seconds: '{seconds}'. Must a positive number."
+        raise argparse.ArgumentTypeError(msg) from exc
+
+
+def get_publish_state(
+    api_url: str,
+    project: str,
+    repositories: list[str],
+    oldstate: str = "",
+    timeout: Optional[float] = None,
+) -> tuple[str, dict[tuple[str, str], str]]:
+    """
+    Get the state of the repositories of a project from the summary of the
+    build results. With oldstate, OBS holds the request until the state of
+    the project is different (long-poll).
+
+    :param api_url: OBS instance
+    :param project: OBS project
+    :param repositories: repositories to be checked, all if empty
+    :param oldstate: state returned by the previous call
+    :param timeout: seconds to wait for the response
+    :return: state of the project and dict (repository, arch) -> state
+    """
+    params = [("view", "summary")]
+    params.extend(("repository", repository) for repository in repositories)
+    if oldstate:
+        params.append(("oldstate", oldstate))
+    response = get_client(api_url).request(
+        "GET", f"/build/{project}/_result", params=params, timeout=timeout
+    )
+    root = ET.fromstring(response.content)
+    states = {}
+    for result in root.iter("result"):
+        state = result.get("state") or result.get("code", "unknown")
+        if result.get("dirty") == "true":
+            # the state is outdated until the scheduler checks the repository
+            state = f"{state} (dirty)"
+        states[(result.get("repository", ""), result.get("arch", ""))] = state
+    return root.get("state", ""), states
+
+
+def backoff(interval: float) -> float:
+    """
+    Randomize a polling interval between its half and itself, so that the
+    watchers do not poll OBS at the same time.
+    """
+    return random.uniform(interval / 2, interval)
+
+
+class PublishWatcher(threading.Thread):
+    """
+    Watch the repositories of a project until they are published, and put
+    the state changes in a queue as ("state", project, repository, arch, old,
+    new) and the end as ("done", project, exit code, message).
+    """
+
+    def __init__(
+        self,
+        api_url: str,
+        project: str,
+        repositories: list[str],
+        events: queue.Queue,
+        deadline: Optional[float] = None,
+        interval: float = 30,
+        max_interval: float = 600,
+    ) -> None:
+        """
+        :param api_url: OBS instance
+        :param project: OBS project
+        :param repositories: repositories to be watched, all if empty
+        :param events: queue of the state changes and of the end
+        :param deadline: time.monotonic() to stop waiting, no limit if None
+        :param interval: first polling interval without long-poll, in seconds
+        :param max_interval: longest polling interval, in seconds
+        """
+        super().__init__(name=f"publish-{project}", daemon=True)
+        self.api_url = api_url
+        self.project = project
+        self.repositories = repositories
+        self.events = events
+        self.deadline = deadline
+        self.interval = interval
+        self.max_interval = max_interval
+        self.stopped = threading.Event()
+
+    def remaining(self) -> float:
+        if self.deadline is None:
+            return float("inf")
+        return self.deadline - time.monotonic()
+
+    def done(self, code: int, message: str) -> None:
+        self.events.put(("done", self.project, code, message))
+
+    def run(self) -> None:
+        try:
+            self.watch()
+        except Exception as e:
+            self.done(EXIT_FAILED, f"{self.project}: {e}")
+
+    def watch(self) -> None:
+        state = ""
+        states: dict[tuple[str, str], str] = {}
+        interval = self.interval
+        retry_interval = self.interval
+        long_poll = True
+        quick_answers = 0
+        polls = 0
+        while not self.stopped.is_set():
+            timeout = min(LONG_POLL_TIMEOUT, self.remaining())
+            if timeout <= 0:
+                pending = {repo for (repo, _), s in states.items() if s != "published"}
+                repositories = ", ".join(sorted(pending) or self.repositories)
+                self.done(
+                    EXIT_TIMEOUT,
+                    f"{self.project}: timeout, {repositories or 'repositories'} "
+                    "not published",
+                )
+                return
+            started = time.monotonic()
+            oldstate = state if long_poll else ""
+            try:
+                new_state, new_states = get_publish_state(
+                    self.api_url, self.project, self.repositories, oldstate, timeout
+                )
+            except ObsApiError as e:
+                if 0 < e.status < 500:
+                    self.done(EXIT_FAILED, str(e))
+                    return
+                if oldstate and time.monotonic() - started >= timeout - 1:
+                    # the long-poll expired, nothing changed
+                    continue
+                delay = min(backoff(retry_interval), timeout)
+                log.warning("%s, retrying in %.0fs", e, delay)
+                self.stopped.wait(delay)
+                retry_interval = min(retry_interval * 2, self.max_interval)
+                continue
+            retry_interval = self.interval
+            if not new_states:
+                repositories = ", ".join(self.repositories) or "repositories"
+                self.done(EXIT_FAILED, f"{self.project}: no {repositories} found")
+                return
+            for key in sorted(new_states):
+                if states.get(key) != new_states[key]:
+                    self.events.put(
+                        (
+                            "state",
+                            self.project,
+                            *key,
+                            states.get(key, ""),
+                            new_states[key],
+                        )
+                    )
+            changed = new_state != state or new_states != states
+            if (
+                oldstate
+                and not changed
+                and time.monotonic() - started < LONG_POLL_MIN_WAIT
+            ):
+                quick_answers += 1
+                if quick_answers >= LONG_POLL_FALLBACK:
+                    log.info("%s does not hold the long-poll, polling", self.api_url)
+                    long_poll = False
+                    polls = 0
+            elif oldstate:
+                quick_answers = 0
+            state, states = new_state, new_states
+            if all(value == "published" for value in states.values()):
+                self.done(EXIT_PUBLISHED, f"{self.project}: published")
+                return
+            broken = sorted(
+                {
+                    repo
+                    for (repo, _), value in states.items()
+                    if value in NOT_PUBLISHABLE_STATES
+                }
+            )
+            if broken:
+                self.done(
+                    EXIT_NOT_PUBLISHABLE,
+                    f"{self.project}: {', '.join(broken)} will not be published",
+                )
+                return
+            if long_poll:
+                continue
+            interval = (
+                self.interval if changed else min(interval * 2, self.max_interval)
+            )
+            self.stopped.wait(min(backoff(interval), max(self.remaining(), 0)))
+            polls += 1
+            if polls >= LONG_POLL_RETRY:
+                # a single answer not held by OBS ends the probe
+                log.debug("%s: trying the long-poll again", self.project)
+                long_poll = True
+                quick_answers = LONG_POLL_FALLBACK - 1
+
+
+def wait_published(
+    api_url: str,
+    targets: list[tuple[str, list[str]]],
+    timeout: int = 0,
+    interval: float = 30,
+    max_interval: float = 600,
+) -> int:
+    """
+    Wait until the repositories of the targets are published, printing their
+    state changes as they happen.
+
+    :param api_url: OBS instance
+    :param targets: list of (project, repositories)
+    :param timeout: seconds to wait, no limit if 0
+    :param interval: first polling interval without long-poll, in seconds
+    :param max_interval: longest polling interval, in seconds
+    :return: exit code, the worst of the targets
+    """
+    events: queue.Queue = queue.Queue()
+    deadline = time.monotonic() + timeout if timeout else None
+    watchers = [
+        PublishWatcher(
+            api_url, project, repositories, events, deadline, interval, max_interval
+        )
+        for project, repositories in targets
+    ]
+    for watcher in watchers:
+        watcher.start()
+    codes = []
+    try:
+        while len(codes) < len(watchers):
+            event = events.get()
+            now = datetime.datetime.now().strftime("%H:%M:%S")
+            if event[0] == "state":
+                _, project, repository, arch, old, new = event
+                print(
+                    f"{now} {project}/{repository} {arch}: {old or '-'} -> {new}",
+                    flush=True,
+                )
+            else:
+                _, project, code, message = event
+                codes.append(code)
+                if code == EXIT_PUBLISHED:
+                    print(f"{now} PUBLISHED {project}", flush=True)
+                else:
+                    log.error(message)
+    except KeyboardInterrupt:
+        for watcher in watchers:
+            watcher.stopped.set()
+        return EXIT_INTERRUPTED
+    # a failure is worse than a repository that will not be published,
+    # which is worse than a timeout
+    for code in [EXIT_FAILED, EXIT_NOT_PUBLISHABLE, EXIT_TIMEOUT]:
+        if code in codes:
+            return code
+    return EXIT_PUBLISHED
+
+
+def build_parser(parent_parser, config: Config) -> None:
+    """
+    Builds the parser for this script. This is executed by the main CLI
+    dynamically.
+
+    :param config: Lua config table
+    :return: The subparsers object from argparse.
+    """
+    subparser = parent_parser.add_parser(
+        "publish", help="Wait for the publication of OBS projects."
+    )
+    actions = subparser.add_subparsers(dest="action", required=True)
+    wait_parser = actions.add_parser(
+        "wait",
+        help="Wait until the repositories of OBS projects are published.",
+        description="Wait until the repositories of OBS projects are published, "
+        "reporting their state changes as they happen. Exit codes: "
+        f"{EXIT_PUBLISHED} published, {EXIT_FAILED} error, "
+        f"{EXIT_NOT_PUBLISHABLE} broken or publishing disabled, "
+        f"{EXIT_TIMEOUT} timeout, {EXIT_INTERRUPTED} interrupted.",
+    )
+    wait_parser.add_argument(
+        "targets",
+        metavar="PROJECT[/REPOSITORY[,...]]",
+        nargs="*",
+        type=valid_target,
+        help=f"OBS/IBS projects and repositories (DEFAULT = {config.common.default_product}).",
+        default=[(config.common.default_product, [])],
+    )
+    repository_group = wait_parser.add_mutually_exclusive_group()
+    repository_group.add_argument(
+        "--repository",
+        "-r",
+        dest="repositories",
+        action="append",
+        help="Repository of the projects given without repositories, can be "
+        f"repeated (DEFAULT = {', '.join(config.publish.repositories)}).",
+    )
+    repository_group.add_argument(
+        "--all-repositories",
+        "-a",
+        action="store_true",
+        help="Watch all the repositories of the projects given without repositories.",
+    )
+    wait_parser.add_argument(
+        "--timeout",
+        "-t",
+        dest="timeout",
+        help="Seconds to wait, 0 waits forever (DEFAULT = 0).",
+        type=valid_seconds,
+        default=0,
+    )
+    wait_parser.add_argument(
+        "--interval",
+        "-i",
+        dest="interval",
+        help="Seconds between the polls when OBS does not hold the long-poll, "
+        f"doubled while nothing changes (DEFAULT = {config.publish.interval}).",
+        type=valid_seconds,
+        default=config.publish.interval,
+    )
+    subparser.set_defaults(func=main)
+
+
+def main(args: Namespace, config: Config) -> None:
+    """
+    Main method that waits for the publication of OBS projects
+
+    :param args: Argparse Namespace that has all the arguments
+    :param config: Lua config table
+    """
+    if args.all_repositories:
+        default_repositories = []
+    else:
+        default_repositories = args.repositories or config.publish.repositories
+    targets = [
+        (project, repositories or default_repositories)
+        for project, repositories in args.targets
+    ]
+    sys.exit(
+        wait_published(
+            args.osc_instance,
+            targets,
+            args.timeout,
+            max(args.interval, 1),
+            max(config.publish.max_interval, args.interval, 1),
+        )
+    )
@@ -1,16 +1,28 @@
 import argparse
+import csv
 import datetime
+import io
+import json
+import re
+from typing import Generator, Optional
 
+from sle_package.utils.archive import RequestArchive, get_archive
 from sle_package.utils.logger import logger_setup
-from sle_package.utils.tools import (
-    count_days,
-    run_command_and_stream_output,
-    running_spinner_decorator,
-)
+from sle_package.utils.obs import iter_search_requests
+from sle_package.utils.tools import running_spinner_decorator, valid_regex
 
 
 log = logger_setup(name=__name__)
 
+REQUEST_URL = "https://build.suse.de/request/show/{}"
+FIELDS = ["id", "type", "when", "package", "url"]
+# accepted requests per search query, the whole history of a project in a
+# single query can exceed the request timeout on the first sync
+SEARCH_PAGE_SIZE = 1000
+# a sync searches again the requests accepted this long before the
+# high-water mark, to get those accepted while the previous sync was paging
+SYNC_OVERLAP = datetime.timedelta(days=1)
+
 
 def valid_days(days: str) -> str:
     """
@@ -41,44 +53,166 @@ def valid_date(string_date: str) -> datetime.date:
         raise argparse.ArgumentTypeError(msg) from exc
 
 
+def iter_accepted_requests(
+    api_url: str,
+    project: str,
+    request_types: Optional[list[str]] = None,
+    since: str = "",
+) -> Generator[dict[str, str], None, None]:
+    """
+    Stream the requests accepted on OBS project
+
+    :param api_url: OBS instance
+    :param project: OBS project
+    :param request_types: submit and/or delete, all if None
+    :param since: first ISO date or timestamp to be considered, all if empty
+    :return: generator of requests, one per action
+    """
+    conditions = ["state/@name='accepted'"]
+    if since:
+        conditions.append(f"state/@when>='{since}'")
+    if request_types:
+        types = " or ".join(f"action/@type='{type_}'" for type_ in request_types)
+        conditions.append(f"({types})")
+    conditions.append(f"action/target/@project='{project}'")
+    match = " and ".join(conditions)
+    for request in iter_search_requests(api_url, match, SEARCH_PAGE_SIZE):
+        request_id = request.get("id", "")
+        state = request.find("state")
+        when = state.get("when", "") if state is not None else ""
+        for action in request.iterfind("action"):
+            source = action.find("source")
+            target = action.find("target")
+            if target is None or target.get("project") != project:
+                continue
+            if request_types and action.get("type") not in request_types:
+                continue
+            # submit requests are reported with the submitted package name
+            package = target.get("package", "")
+            if source is not None and source.get("package"):
+                package = source.get("package", "")
+            yield {
+                "id": request_id,
+                "type": action.get("type", ""),
+                "when": when,
+                "package": package,
+            }
+
+
 @running_spinner_decorator
 def list_requests(
-    api_url: str, project: str, request_type: str, time_period: str = ""
-) -> None:
+    api_url: str, project: str, request_types: list[str], since: datetime.date
+) -> list[dict[str, str]]:
     """
-    List all requests accpeted on OBS project
+    List all requests accepted on OBS project
 
     :param api_url: OBS instance
     :param project: OBS project
-    :param request_type: submit or delete
-    :param time_period: time to be consider for the query
+    :param request_types: submit and/or delete
+    :param since: first day to be considered
+    :return: list of requests, one per action, sorted by acceptance time
+    """
+    requests = list(
+        iter_accepted_requests(api_url, project, request_types, since.isoformat())
+    )
+    requests.sort(key=lambda request: (request["when"], request["id"]))
+    return requests
+
+
+def overlap_since(high_water: str) -> str:
+    """
+    Start of the search of a sync, SYNC_OVERLAP before the high-water mark.
+    The requests found again are replaced in the archive.
+
+    :param high_water: ISO timestamp of the newest archived request
+    :return: ISO timestamp
+    """
+    try:
+        when = datetime.datetime.fromisoformat(high_water)
+    except ValueError:
+        return high_water
+    return (when - SYNC_OVERLAP).isoformat()
+
+
+@running_spinner_decorator
+def sync_archive(
+    archive: RequestArchive, api_url: str, project: str, full: bool = False
+) -> int:
+    """
+    Download the requests accepted on OBS project since the last sync into
+    the local archive, all of them on the first sync or if full.
+
+    :param archive: request archive
+    :param api_url: OBS instance
+    :param project: OBS project
+    :param full: drop the archived requests and download them all again
+    :return: number of downloaded requests
+    """
+    since = "" if full else archive.high_water(api_url, project) or ""
+    if since:
+        since = overlap_since(since)
+    log.debug(">> syncing %s since '%s'", project, since)
+    requests = list(iter_accepted_requests(api_url, project, since=since))
+    archive.store(api_url, project, requests, full)
+    return len(requests)
+
+
+def filter_requests(
+    requests: list[dict[str, str]], until: str, package_regex: Optional[re.Pattern]
+) -> list[dict[str, str]]:
+    """
+    Filter the requests by acceptance time and by package
+
+    :param requests: list of requests
+    :param until: last ISO date, excluded, no limit if empty
+    :param package_regex: keep only the matching packages, all if None
     :return: list of requests
     """
-    command = [
-        "/bin/bash",
-        "-c",
-        f"""
-ex <(osc -A {api_url} request list -t {request_type} {time_period} -s accepted {project}) << EOF
-# cleanup input
-v/^\([0-9]\| *{request_type}:\)/d
-# join lines 2 by 2
-g/./j
-# delete all empty lines
-g/^$/d
-# cleanup for submit request
-%s/@.*$//g
-%p
-q!
-EOF
-[ $? -ne 0 ] && exit 0
-""",
+    return [
+        request
+        for request in requests
+        if (not until or request["when"] < until)
+        and (not package_regex or package_regex.search(request["package"]))
     ]
-    for line in run_command_and_stream_output(command):
-        line_fields = line.split()
-        # ['000000', 'State:accepted', 'By:foo', 'When:2025-02-07T17:05:34', 'delete:', 'SUSE:SLFO:Main/utempter']
-        # ['111111', 'State:accepted', 'By:bar', 'When:2025-02-07T17:06:21', 'submit:', 'openSUSE.org:openSUSE:Tools/product-composer@01bab0f7cdbfe17066156f2127b9da63', '->', 'SUSE:SLFO:Main']
-        formated_line = f"{line_fields[3].split(':', 1)[1]} {line_fields[5].rsplit('/', 1)[1]} https://build.suse.de/request/show/{line_fields[0]}"
-        print(formated_line)
+
+
+def format_text(requests: list[dict[str, str]], request_types: list[str]) -> str:
+    """
+    Format the requests as "{when} {package} {url}" lines, with a section per
+    request type if there is more than one.
+
+    :param requests: result of list_requests
+    :param request_types: submit and/or delete
+    :return: text report
+    """
+    buffer = []
+    for request_type in request_types:
+        if len(request_types) > 1:
+            if buffer:
+                buffer.append("")
+            buffer.append("=" * 30)
+            buffer.append(f"{request_type.upper()} REQUESTS")
+            buffer.append("=" * 30)
+        buffer.extend(
+            f"{request['when']} {request['package']} {request['url']}"
+            for request in requests
+            if request["type"] == request_type
+        )
+    return "\n".join(buffer)
+
+
+def format_csv(requests: list[dict[str, str]]) -> str:
+    """
+    Format the requests as CSV, with a header line.
+
+    :param requests: result of list_requests
+    :return: CSV document
+    """
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=FIELDS, lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(requests)
+    return output.getvalue().rstrip("\n")
 
 
 def build_parser(parent_parser, config) -> None:
@@ -103,14 +237,15 @@ def build_parser(parent_parser, config) -> None:
     subparser.add_argument(
         "--type",
         "-t",
-        dest="request_type",
+        dest="request_types",
         type=str,
+        nargs="+",
         choices=["submit", "delete"],
-        help="Choose a request type (submit or delete).",
-        required=True,
+        help="Choose the request types (DEFAULT = submit delete).",
+        default=["submit", "delete"],
     )
     # Mutually exclusive group within the subparser
-    group = subparser.add_mutually_exclusive_group(required=True)
+    group = subparser.add_mutually_exclusive_group()
     group.add_argument(
         "--days", "-d", dest="days", help="Number of the days.", type=valid_days
     )
@@ -121,6 +256,50 @@ def build_parser(parent_parser, config) -> None:
         type=valid_date,
         help="Date in YYYY-MM-DD format.",
     )
+    subparser.add_argument(
+        "--to_date",
+        dest="to_date",
+        type=valid_date,
+        help="Last date in YYYY-MM-DD format (DEFAULT = today).",
+    )
+    subparser.add_argument(
+        "--package-regex",
+        dest="package_regex",
+        help="Only the requests of the packages matching the regular expression.",
+        type=valid_regex,
+    )
+    subparser.add_argument(
+        "--archive",
+        "-a",
+        dest="archive",
+        action="store_true",
+        help="Answer from the local archive of accepted requests, synced first.",
+    )
+    subparser.add_argument(
+        "--no-sync",
+        dest="no_sync",
+        action="store_true",
+        help="Do not sync the local archive before answering from it.",
+    )
+    subparser.add_argument(
+        "--sync-only",
+        dest="sync_only",
+        action="store_true",
+        help="Only sync the local archive with the newly accepted requests.",
+    )
+    subparser.add_argument(
+        "--resync",
+        dest="resync",
+        action="store_true",
+        help="Drop the local archive of the project and download it all again.",
+    )
+    subparser.add_argument(
+        "--format",
+        dest="output_format",
+        help="Output format (DEFAULT = text).",
+        choices=["text", "json", "csv"],
+        default="text",
+    )
     subparser.set_defaults(func=main)
 
 
@@ -131,11 +310,54 @@ def main(args, config) -> None:
     :param args: Argparse Namespace that has all the arguments
     :param config: Lua config table
     """
-    time_period = ""
+    since = None
     if args.days:
-        time_period = f"-D {args.days}"
+        since = datetime.date.today() - datetime.timedelta(days=int(args.days))
     elif args.date:
-        days = count_days(args.date)
-        time_period = f"-D {days}"
+        since = args.date
+    until = ""
+    if args.to_date:
+        until = (args.to_date + datetime.timedelta(days=1)).isoformat()
+    # keep the order given by the user, without duplicates
+    request_types = list(dict.fromkeys(args.request_types))
+    use_archive = args.archive or args.sync_only or args.resync
+    if since is None and not (args.sync_only or args.resync):
+        log.error("One of --days or --from_date is required.")
+        return
 
-    list_requests(args.osc_instance, args.project, args.request_type, time_period)
+    try:
+        if use_archive:
+            archive = get_archive()
+            try:
+                if args.resync or args.sync_only or not args.no_sync:
+                    count = sync_archive(
+                        archive, args.osc_instance, args.project, args.resync
+                    )
+                    log.debug(">> %s requests archived", count)
+                if since is None or args.sync_only:
+                    return
+                requests = archive.query(
+                    args.osc_instance,
+                    args.project,
+                    request_types,
+                    since.isoformat(),
+                    until,
+                )
+            finally:
+                archive.close()
+        else:
+            requests = list_requests(
+                args.osc_instance, args.project, request_types, since
+            )
+    except RuntimeError as e:
+        log.error(e)
+        return
+    requests = filter_requests(requests, until, args.package_regex)
+    for request in requests:
+        request["url"] = REQUEST_URL.format(request["id"])
+    if args.output_format == "json":
+        print(json.dumps(requests, indent=2))
+    elif args.output_format == "csv":
+        print(format_csv(requests))
+    else:
+        print(format_text(requests, request_types))
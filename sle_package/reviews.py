@@ -1,20 +1,36 @@
 import argparse
+import os
+import re
 import sys
+import tempfile
+import threading
 from bs4 import BeautifulSoup
+from concurrent.futures import Future, ThreadPoolExecutor
 from rich.console import Console
 from rich.panel import Panel
+from rich.progress import Progress
 from rich.prompt import Prompt
+from rich.table import Table
+from typing import Optional
 
 from sle_package.utils.logger import logger_setup
+from sle_package.utils.obs import ObsApiError, get_client, iter_search_requests
 from sle_package.utils.tools import (
     pager_command,
-    run_command,
     running_spinner_decorator,
+    valid_jobs,
+    valid_regex,
 )
 
 
 log = logger_setup(__name__)
 
+# group of the reviews handled by this tool
+REVIEW_GROUP = "sle-release-managers"
+
+# prefetched diffs bigger than this are kept on disk instead of in memory
+SPILL_SIZE = 1024 * 1024
+
 
 def valid_staging(staging: str) -> str:
     """
@@ -33,6 +49,21 @@ def valid_staging(staging: str) -> str:
         raise argparse.ArgumentTypeError(msg) from exc
 
 
+def valid_prefetch(prefetch: str) -> int:
+    """
+    Validate if the number of prefetched requests is a positive number, or 0
+    to disable the prefetch, to be used in argparse
+    """
+    try:
+        if int(prefetch) < 0:
+            msg = "Prefetch must be a positive number or 0."
+            raise argparse.ArgumentTypeError(msg)
+        return int(prefetch)
+    except ValueError as exc:
+        msg = f"Not a valid prefetch: '{prefetch}'. Must a positive number or 0."
+        raise argparse.ArgumentTypeError(msg) from exc
+
+
 def print_panel(lines: list[str], title: str="") -> None:
     console = Console()
     panel_content = "\n".join(lines)
@@ -45,52 +76,266 @@ def list_requests(
     api_url: str, project: str, is_bugowner_request: bool = False
 ) -> list[tuple[str, str]]:
     """
-    List all source packages from a OBS project
+    List the requests of a OBS project with a new review of the release
+    managers, filtered by OBS
 
     :param api_url: OBS instance
     :param project: OBS project
     :param is_bugowner_request: list bugowner requests
-    :return: list of source packages
+    :return: list of (request ID, target package)
     """
-    command = f"osc -A {api_url} api".split()
+    review = f"review[@by_group='{REVIEW_GROUP}' and @state='new']"
     if is_bugowner_request:
-        command.append(
-            f"/search/request?match=state/@name='review' and action/@type='set_bugowner' and action/target/@project='{project}'&withhistory=0&withfullhistory=0"
+        match = (
+            f"state/@name='review' and {review} and action/@type='set_bugowner' "
+            f"and action/target/@project='{project}'"
         )
     else:
-        command.append(
-            f"/search/request?match=state/@name='review' and review/@state='new' and review/@by_project='{project}'&withhistory=0&withfullhistory=0"
+        match = f"state/@name='review' and {review} and review/@by_project='{project}'"
+
+    requests = []
+    for request in iter_search_requests(api_url, match):
+        state = request.find("state")
+        review = request.find(f"review[@by_group='{REVIEW_GROUP}'][@state='new']")
+        if state is None or state.get("name") != "review" or review is None:
+            continue
+        action = request.find("action")
+        target = action.find("target") if action is not None else None
+        request_tuple = (
+            request.get("id"),
+            target.get("package") if target is not None else None,
+        )
+        log.debug(
+            "request_tuple=%s type=%s",
+            request_tuple,
+            action.get("type") if action is not None else None,
         )
-    result = run_command(command)
+        requests.append(request_tuple)
+    return requests
 
-    soup = BeautifulSoup(result.stdout, "lxml")
 
-    requests = []
+def get_request_info(api_url: str, request: str) -> tuple[tuple, list[str]]:
+    """
+    Get the request details
 
-    for request in soup.find_all("request"):
-        state_tag = request.find("state")
-        if state_tag and state_tag.get("name") == "review":
-            relmgr_review = request.find("review", {"by_group": "sle-release-managers"})
-            if relmgr_review and relmgr_review.get("state") == "new":
-                request_tuple = (
-                    request.get("id"),
-                    request.action.target.get("package"),
-                )
-                log.debug(f"{request_tuple=}")
-                requests.append(request_tuple)
-    return requests
+    :param api_url: OBS instance
+    :param request: request ID
+    :return: request state (with the reviews) and the lines describing it
+    """
+    soup = BeautifulSoup(get_client(api_url).get(f"/request/{request}"), "lxml")
+    lines = [f"Request: #{request}"]
+    for action in soup.find_all("action"):
+        source = action.find("source")
+        target = action.find("target")
+        line = f"  {action.get('type')}:"
+        if source:
+            line += f" {source.get('project')}/{source.get('package')}"
+            line += " ->"
+        if target:
+            line += f" {target.get('project')}/{target.get('package') or ''}"
+        lines.append(line)
+    state = soup.find("state")
+    if state:
+        lines.append(
+            f"State: {state.get('name')} {state.get('when')} {state.get('who')}"
+        )
+    description = soup.find("description")
+    if description and description.text:
+        lines.append("Descr: " + description.text.strip())
+    request_state = (
+        state.get("name") if state else None,
+        state.get("when") if state else None,
+        tuple(
+            (review.get("by_group"), review.get("by_user"), review.get("state"))
+            for review in soup.find_all("review")
+        ),
+    )
+    return request_state, lines
+
+
+def fetch_request(api_url: str, request: str) -> tuple[tuple, str]:
+    """
+    Get the request details and diff
+
+    :param api_url: OBS instance
+    :param request: request ID
+    :return: request state and the text to show
+    """
+    request_state, lines = get_request_info(api_url, request)
+    lines.append("")
+    diff = get_client(api_url).post(f"/request/{request}", params={"cmd": "diff"})
+    return request_state, "\n".join(lines) + "\n" + diff
 
 
-def show_request(api_url: str, request: str) -> None:
+def show_request(api_url: str, request: str, content: Optional[str] = None) -> None:
     """
     Show reviewed request details
 
     :param api_url: OBS instance
     :param request: request ID
+    :param content: already fetched details and diff
     """
-    command = f"osc -A {api_url} review show -d {request}"
-    output = run_command(command.split())
-    pager_command(["delta"], output.stdout)
+    if content is None:
+        _, content = fetch_request(api_url, request)
+    pager_command(["delta"], content)
+
+
+class RequestPrefetcher:
+    """
+    Fetch the details and diffs of the next requests in the background while
+    the current one is reviewed. Only the next few requests are kept, the big
+    diffs in a temporary directory, and they are fetched again if the request
+    changed in the meantime. The fetches run in daemon threads, so quitting
+    the review does not wait for the diffs still being fetched.
+    """
+
+    def __init__(self, api_url: str, requests: list[str], depth: int) -> None:
+        """
+        :param api_url: OBS instance
+        :param requests: request IDs in review order
+        :param depth: number of requests fetched ahead, 0 to fetch each
+                      request when it is reviewed
+        """
+        self.api_url = api_url
+        self.requests = requests
+        self.depth = depth
+        self.slots = threading.Semaphore(max(depth, 1))
+        self.tmp_dir = tempfile.TemporaryDirectory(prefix="sle_tools-")
+        self.futures: dict[int, Future] = {}
+
+    def __enter__(self) -> "RequestPrefetcher":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def _fetch(self, request: str) -> tuple[tuple, str, bool]:
+        request_state, content = fetch_request(self.api_url, request)
+        if len(content) <= SPILL_SIZE:
+            return request_state, content, False
+        fd, path = tempfile.mkstemp(dir=self.tmp_dir.name, suffix=".diff")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        return request_state, path, True
+
+    def _submit(self, request: str) -> Future:
+        """
+        Fetch a request in a daemon thread, unlike ThreadPoolExecutor whose
+        threads are joined at exit even after shutdown(wait=False).
+        """
+        future: Future = Future()
+
+        def run() -> None:
+            with self.slots:
+                if not future.set_running_or_notify_cancel():
+                    return
+                try:
+                    future.set_result(self._fetch(request))
+                except Exception as e:
+                    future.set_exception(e)
+
+        threading.Thread(target=run, name=f"prefetch-{request}", daemon=True).start()
+        return future
+
+    def _discard(self, index: int) -> None:
+        future = self.futures.pop(index)
+        if future.cancel():
+            return
+        future.add_done_callback(self._remove_spilled)
+
+    @staticmethod
+    def _remove_spilled(future: Future) -> None:
+        if future.cancelled() or future.exception():
+            return
+        _, content, spilled = future.result()
+        if spilled:
+            os.unlink(content)
+
+    def prefetch(self, index: int) -> None:
+        """
+        Start fetching the requests after the given one, dropping the
+        requests before it that were skipped.
+
+        :param index: index of the current request
+        """
+        for old_index in [i for i in self.futures if i < index]:
+            self._discard(old_index)
+        for next_index in range(index, min(index + self.depth, len(self.requests))):
+            if next_index not in self.futures:
+                self.futures[next_index] = self._submit(self.requests[next_index])
+
+    def get(self, index: int) -> str:
+        """
+        Return the details and diff of a request, fetching it again if it
+        changed since it was prefetched.
+
+        :param index: index of the request
+        :return: text to show
+        """
+        request = self.requests[index]
+        self.prefetch(index)
+        future = self.futures.pop(index, None)
+        self.prefetch(index + 1)
+        try:
+            if future is None:
+                raise ObsApiError(f"SR#{request} was not prefetched")
+            request_state, content, spilled = future.result()
+        except ObsApiError as e:
+            log.debug(">> %s", e)
+            return fetch_request(self.api_url, request)[1]
+        if spilled:
+            with open(content, encoding="utf-8") as f:
+                path, content = content, f.read()
+            os.unlink(path)
+        if get_request_info(self.api_url, request)[0] != request_state:
+            log.debug(">> SR#%s changed since it was prefetched", request)
+            content = fetch_request(self.api_url, request)[1]
+        return content
+
+    def close(self) -> None:
+        """
+        Cancel the pending fetches, without waiting for the running ones, and
+        remove the temporary files.
+        """
+        for future in self.futures.values():
+            future.cancel()
+        self.futures.clear()
+        self.tmp_dir.cleanup()
+
+
+def get_review_groups(is_bugowner: bool) -> list[str]:
+    """
+    Groups that have to accept the review of a request
+
+    :param is_bugowner: is a bugowner request
+    :return: list of groups
+    """
+    groups: list = [REVIEW_GROUP]
+    if is_bugowner:
+        groups.append("sle-staging-managers")
+    return groups
+
+
+def accept_review(api_url: str, request: str, group: str) -> str:
+    """
+    Accept the review of a group in a request
+
+    :param api_url: OBS instance
+    :param request: request ID
+    :param group: reviewing group
+    :return: status code returned by OBS
+    """
+    output = get_client(api_url).post(
+        f"/request/{request}",
+        params={
+            "cmd": "changereviewstate",
+            "newstate": "accepted",
+            "by_group": group,
+            "comment": "OK",
+        },
+    )
+    status = BeautifulSoup(output, "lxml").find("status")
+    return status.get("code") if status else output
 
 
 @running_spinner_decorator
@@ -102,15 +347,98 @@ def approve_request(api_url: str, request: str, is_bugowner: bool) -> list[str]:
     :param request: request ID
     :param bugowner: is a bugowner request
     """
-    groups: list = ["sle-release-managers"]
-    lines = []
-    if is_bugowner:
-        groups.append("sle-staging-managers")
+    return [
+        f"{group}: {accept_review(api_url, request, group)}"
+        for group in get_review_groups(is_bugowner)
+    ]
+
+
+def accept_reviews(api_url: str, request: str, groups: list[str]) -> dict[str, str]:
+    """
+    Accept the reviews of all the groups in a request, one after the other
+    as they change the same request. Errors are reported as the group result.
+
+    :param api_url: OBS instance
+    :param request: request ID
+    :param groups: reviewing groups
+    :return: dict group -> status code or error
+    """
+    results = {}
     for group in groups:
-        command = f"osc -A {api_url} review accept -m 'OK' -G {group} {request}"
-        output = run_command(command.split())
-        lines.append(f"{group}: {output.stdout}")
-    return lines
+        try:
+            results[group] = accept_review(api_url, request, group)
+        except ObsApiError as e:
+            log.error("SR#%s %s: %s", request, group, e)
+            results[group] = f"failed ({e.status})" if e.status else "failed"
+    return results
+
+
+def approve_requests(
+    api_url: str, requests: list[tuple[str, str]], is_bugowner: bool, jobs: int
+) -> list[dict[str, str]]:
+    """
+    Approve several requests in parallel
+
+    :param api_url: OBS instance
+    :param requests: list of (request ID, package)
+    :param is_bugowner: are bugowner requests
+    :param jobs: number of parallel requests
+    :return: list of dict group -> status code or error, in the same order
+    """
+    groups = get_review_groups(is_bugowner)
+    with Progress() as progress, ThreadPoolExecutor(max_workers=jobs) as executor:
+        task_id = progress.add_task("Approving requests", total=len(requests))
+        futures = []
+        for request, _ in requests:
+            future = executor.submit(accept_reviews, api_url, request, groups)
+            future.add_done_callback(lambda _: progress.update(task_id, advance=1))
+            futures.append(future)
+        return [future.result() for future in futures]
+
+
+def filter_requests(
+    requests: list[tuple[str, str]],
+    request_ids: list[str],
+    package_regex: re.Pattern,
+) -> list[tuple[str, str]]:
+    """
+    Filter the requests by ID and by package
+
+    :param requests: list of (request ID, package)
+    :param request_ids: keep only these request IDs, all if empty
+    :param package_regex: keep only the matching packages, all if None
+    :return: list of (request ID, package)
+    """
+    if request_ids:
+        missing = set(request_ids) - {request for request, _ in requests}
+        for request in sorted(missing):
+            log.warning("SR#%s has no pending review", request)
+        requests = [request for request in requests if request[0] in request_ids]
+    if package_regex:
+        requests = [
+            request for request in requests if package_regex.search(request[1] or "")
+        ]
+    return requests
+
+
+def print_approvals(
+    requests: list[tuple[str, str]], results: list[dict[str, str]]
+) -> None:
+    """
+    Print the summary table of a batch approval
+
+    :param requests: list of (request ID, package)
+    :param results: result of approve_requests
+    """
+    groups = list(results[0]) if results else []
+    table = Table(title="Approved Reviews")
+    table.add_column("Request")
+    table.add_column("Package")
+    for group in groups:
+        table.add_column(group)
+    for (request, package), result in zip(requests, results):
+        table.add_row(f"SR#{request}", package, *(result[group] for group in groups))
+    Console().print(table)
 
 
 def show_request_list(requests: list[tuple[str, str]]) -> list[str]:
@@ -150,6 +478,43 @@ def build_parser(parent_parser, config) -> None:
     group.add_argument(
         "--bugowner", "-b", action="store_true", help="Review bugowner requests."
     )
+    subparser.add_argument(
+        "--approve",
+        dest="approve",
+        action="store_true",
+        help="Approve all the (filtered) requests without reviewing them.",
+    )
+    subparser.add_argument(
+        "--request",
+        "-r",
+        dest="request_ids",
+        nargs="+",
+        metavar="ID",
+        help="Only the given request IDs.",
+        default=[],
+    )
+    subparser.add_argument(
+        "--package-regex",
+        dest="package_regex",
+        help="Only the requests of the packages matching the regular expression.",
+        type=valid_regex,
+    )
+    subparser.add_argument(
+        "--jobs",
+        "-j",
+        dest="jobs",
+        help=f"Number of parallel approvals (DEFAULT = {config.reviews.jobs}).",
+        type=valid_jobs,
+        default=config.reviews.jobs,
+    )
+    subparser.add_argument(
+        "--prefetch",
+        dest="prefetch",
+        help="Number of request diffs fetched ahead while reviewing, 0 disables "
+        f"it (DEFAULT = {config.reviews.prefetch}).",
+        type=valid_prefetch,
+        default=config.reviews.prefetch,
+    )
     subparser.set_defaults(func=main)
 
 
@@ -166,26 +531,64 @@ def main(args, config) -> None:
     if args.staging:
         project = f"{project}:Staging:{args.staging}"
     requests = list_requests(args.osc_instance, project, args.bugowner)
+    requests = filter_requests(requests, args.request_ids, args.package_regex)
 
     print_panel(show_request_list(requests), "Request Reviews")
     total_requests = len(requests)
     if total_requests == 0:
         sys.exit(0)
 
+    if args.approve:
+        results = approve_requests(
+            args.osc_instance, requests, args.bugowner, args.jobs
+        )
+        print_approvals(requests, results)
+        failed = [
+            request
+            for request, result in zip(requests, results)
+            if any(status != "ok" for status in result.values())
+        ]
+        if failed:
+            log.error("%d of %d requests not approved", len(failed), total_requests)
+            sys.exit(1)
+        sys.exit(0)
+
+    prefetcher = RequestPrefetcher(
+        args.osc_instance, [request[0] for request in requests], args.prefetch
+    )
+    with prefetcher:
+        # fetch the first diffs while the reviewer reads the list
+        prefetcher.prefetch(0)
+        review_requests(args, requests, prefetcher)
+
+    print_panel(["All reviews done."])
+
+
+def review_requests(
+    args, requests: list[tuple[str, str]], prefetcher: RequestPrefetcher
+) -> None:
+    """
+    Review the requests one by one, interactively
+
+    :param args: Argparse Namespace that has all the arguments
+    :param requests: list of (request ID, package)
+    :param prefetcher: prefetcher of the request diffs
+    """
+    total_requests = len(requests)
     start_review = Prompt.ask(
         f">>> Start the reviews ({total_requests})?", choices=["y", "n"], default="y"
     )
     if start_review == "n":
         sys.exit(0)
 
-    for index, request in enumerate(requests, start=1):
+    for index, request in enumerate(requests):
         review_request = Prompt.ask(
-            f">>> [{index}/{total_requests}] Review {request[0]} - {request[1]}?",
+            f">>> [{index + 1}/{total_requests}] Review {request[0]} - {request[1]}?",
             choices=["y", "n", "a"],
             default="y",
         )
         if review_request == "y":
-            show_request(args.osc_instance, request[0])
+            show_request(args.osc_instance, request[0], prefetcher.get(index))
             request_approval = Prompt.ask(
                 f">>> Approve {request[0]} - {request[1]}?",
                 choices=["y", "n", "a"],
@@ -195,5 +598,3 @@ def main(args, config) -> None:
                 print_panel(approve_request(args.osc_instance, request[0], args.bugowner))
         elif review_request == "a":
             sys.exit(0)
-
-    print_panel(["All reviews done."])
@@ -1,33 +1,42 @@
+import sys
 from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
 from rich.console import Console
 from rich.rule import Rule
 from rich.table import Table
-from subprocess import CalledProcessError
-from typing import Generator
+from typing import Generator, Optional
 
 from sle_package.utils.logger import logger_setup
-from sle_package.utils.tools import (
-    run_command,
-    running_spinner_decorator,
-)
+from sle_package.utils.obs import ObsApiError, get_client
+from sle_package.utils.tools import memoize, running_spinner_decorator
 
 
 log = logger_setup(__name__)
 
+SEARCH_MATCHES = {
+    "login": '@login="{}"',
+    "email": '@email="{}"',
+    "name": 'contains(@realname,"{}")',
+}
+PERSON_FIELDS = {
+    "User": "login",
+    "Email": "email",
+    "Name": "realname",
+    "State": "state",
+}
+# length of the combined XPath expressions, they are sent in the URL
+MAX_MATCH_LENGTH = 2000
+MAX_GROUP_QUERIES = 8
+NOT_FOUND = "*** NOT FOUND ***"
 
-@running_spinner_decorator
-def get_groups(api_url: str, group: str, is_fulllist: bool = False) -> dict:
-    """
-    Given a group name return the OBS info about it."
 
-    :param api_url: OBS instance
-    :param group: OBS group name
-    :return: OBS group info
+def read_group(api_url: str, group: str, is_fulllist: bool = False) -> dict:
+    """
+    Given a group name return the OBS info about it, see get_groups.
     """
     try:
-        command = f"osc -A {api_url} api /group/{group}"
-        output = run_command(command.split())
-        soup = BeautifulSoup(output.stdout, "lxml")
+        output = get_client(api_url).get(f"/group/{group}")
+        soup = BeautifulSoup(output, "lxml")
         info = {}
 
         title = soup.find("title")
@@ -46,10 +55,84 @@ def get_groups(api_url: str, group: str, is_fulllist: bool = False) -> dict:
             ]
 
         return info
-    except CalledProcessError as e:
+    except ObsApiError as e:
         raise RuntimeError(f"{group} not found.") from e
 
 
+@memoize
+@running_spinner_decorator
+def get_groups(api_url: str, group: str, is_fulllist: bool = False) -> dict:
+    """
+    Given a group name return the OBS info about it."
+
+    :param api_url: OBS instance
+    :param group: OBS group name
+    :return: OBS group info
+    """
+    return read_group(api_url, group, is_fulllist)
+
+
+@running_spinner_decorator
+def resolve_groups(
+    api_url: str, groups: list[str], is_fulllist: bool = False
+) -> list[tuple[str, Optional[dict]]]:
+    """
+    Given several group names return the OBS info about them, fetched in
+    parallel.
+
+    :param api_url: OBS instance
+    :param groups: OBS group names
+    :param is_fulllist: include the group members
+    :return: list of (group, OBS group info or None if not found), in order
+    """
+    with ThreadPoolExecutor(max_workers=MAX_GROUP_QUERIES) as executor:
+        futures = [
+            executor.submit(read_group, api_url, group, is_fulllist) for group in groups
+        ]
+        results = []
+        for group, future in zip(groups, futures):
+            try:
+                results.append((group, future.result()))
+            except RuntimeError as e:
+                log.debug(e)
+                results.append((group, None))
+        return results
+
+
+def parse_people(output: str) -> list[dict]:
+    """
+    Parse the result of a /search/person query.
+
+    :param output: OBS collection of persons
+    :return: list of OBS user info
+    """
+    soup = BeautifulSoup(output, "lxml")
+    people = []
+    for person in soup.find_all("person"):
+        people.append(
+            {
+                key: tag.text if (tag := person.find(name)) else ""
+                for key, name in PERSON_FIELDS.items()
+            }
+        )
+    return people
+
+
+def get_search_field(
+    is_login: bool = True, is_email: bool = False, is_realname: bool = False
+) -> str:
+    """
+    Return the user search field from the search flags.
+    """
+    if is_login:
+        return "login"
+    if is_email:
+        return "email"
+    if is_realname:
+        return "name"
+    raise RuntimeError("Invalid user search.")
+
+
 @running_spinner_decorator
 def get_users(
     api_url: str,
@@ -69,37 +152,101 @@ def get_users(
     :return: OBS user info
     """
     try:
-        if is_login:
-            command = (
-                f'osc -A {api_url} api /search/person?match=@login="{search_text}"'
-            )
-        elif is_email:
-            command = (
-                f'osc -A {api_url} api /search/person?match=@email="{search_text}"'
-            )
-        elif is_realname:
-            command = f'osc -A {api_url} api /search/person?match=contains(@realname,"{search_text}")'
-        else:
-            raise RuntimeError("Invalid user search.")
-
-        output = run_command(command.split())
-        soup = BeautifulSoup(output.stdout, "lxml")
-        info = {}
-        people = soup.find_all("person")
+        field = get_search_field(is_login, is_email, is_realname)
+        match = SEARCH_MATCHES[field].format(search_text)
+        output = get_client(api_url).get("/search/person", params={"match": match})
+        people = parse_people(output)
         if not people:
             raise RuntimeError(f"{search_text} not found.")
-        for person in people:
-            info = {
-                "User": person.find("login").text,
-                "Email": person.find("email").text,
-                "Name": person.find("realname").text,
-                "State": person.find("state").text,
-            }
-            yield info
-    except CalledProcessError as e:
+        yield from people
+    except ObsApiError as e:
         raise RuntimeError(f"{search_text} not found.") from e
 
 
+def is_user_match(field: str, search_text: str, info: dict) -> bool:
+    """
+    Check if an OBS user is a result of a search text.
+    """
+    if field == "login":
+        return info["User"] == search_text
+    if field == "email":
+        return info["Email"].lower() == search_text.lower()
+    return search_text in info["Name"]
+
+
+def chunk_matches(field: str, search_texts: list[str]) -> Generator:
+    """
+    Combine the searches of a field in XPath expressions short enough for an
+    URL, e.g. '@login="a" or @login="b"'.
+
+    :param field: login, email or name
+    :param search_texts: texts to search
+    :return: generator of XPath expressions
+    """
+    conditions: list[str] = []
+    length = 0
+    for search_text in search_texts:
+        condition = SEARCH_MATCHES[field].format(search_text)
+        if conditions and length + len(condition) > MAX_MATCH_LENGTH:
+            yield " or ".join(conditions)
+            conditions, length = [], 0
+        conditions.append(condition)
+        length += len(condition) + len(" or ")
+    if conditions:
+        yield " or ".join(conditions)
+
+
+@running_spinner_decorator
+def resolve_users(
+    api_url: str, search_texts: list[str], field: str = "login"
+) -> list[tuple[str, list[dict]]]:
+    """
+    Given many search texts return the OBS users, with a few combined
+    searches instead of one per text.
+
+    :param api_url: OBS instance
+    :param search_texts: texts to search
+    :param field: login, email or name
+    :return: list of (search text, OBS users info, empty if not found), in
+             the input order
+    """
+    people = []
+    for match in chunk_matches(field, list(dict.fromkeys(search_texts))):
+        try:
+            output = get_client(api_url).get("/search/person", params={"match": match})
+        except ObsApiError as e:
+            raise RuntimeError(f"User search failed: {e}") from e
+        people.extend(parse_people(output))
+    return [
+        (
+            search_text,
+            [info for info in people if is_user_match(field, search_text, info)],
+        )
+        for search_text in search_texts
+    ]
+
+
+def read_search_texts(args) -> list[str]:
+    """
+    Return the search texts of the command line, followed by the ones of the
+    given file (or stdin for "-"), one per line.
+
+    :param args: Argparse Namespace that has all the arguments
+    :return: list of search texts
+    """
+    search_texts = list(args.search_texts)
+    if args.file:
+        if args.file == "-":
+            lines = sys.stdin.read().splitlines()
+        else:
+            with open(args.file, encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        search_texts.extend(
+            line.strip() for line in lines if line.strip() and not line.startswith("#")
+        )
+    return search_texts
+
+
 def build_parser(parent_parser, config) -> None:
     """
     Builds the parser for this script. This is executed by the main CLI
@@ -124,7 +271,20 @@ def build_parser(parent_parser, config) -> None:
     group.add_argument(
         "--name", "-n", action="store_true", help="Search user for name."
     )
-    subparser.add_argument("search_text", type=str, help="Search text.")
+    subparser.add_argument(
+        "search_texts",
+        metavar="search_text",
+        type=str,
+        nargs="*",
+        help="Search texts.",
+    )
+    subparser.add_argument(
+        "--file",
+        "-f",
+        dest="file",
+        help='File with a search text per line, "-" for stdin.',
+        type=str,
+    )
     subparser.set_defaults(func=main)
 
 
@@ -137,21 +297,59 @@ def main(args, config) -> None:
     """
     console = Console()
     try:
+        search_texts = read_search_texts(args)
+        if not search_texts:
+            raise RuntimeError("No search text given.")
+        if len(search_texts) > 1:
+            print_batch(args, search_texts)
+            return
         table = Table(show_header=False)
         if args.group:
             for key, value in get_groups(
-                args.osc_instance, args.search_text, True
+                args.osc_instance, search_texts[0], True
             ).items():
                 log.debug("%s: %s", key, value)
                 table.add_row(key, str(value))
         else:
             for info in get_users(
-                args.osc_instance, args.search_text, args.login, args.email, args.name
+                args.osc_instance, search_texts[0], args.login, args.email, args.name
             ):
                 for key, value in info.items():
                     log.debug("%s: %s", key, value)
                     table.add_row(key, str(value))
                 table.add_row(Rule(style="dim"), Rule(style="dim"))
         console.print(table)
-    except RuntimeError as e:
+    except (OSError, RuntimeError) as e:
         log.error(e)
+
+
+def print_batch(args, search_texts: list[str]) -> None:
+    """
+    Print the OBS info of several users or groups, a row per result.
+
+    :param args: Argparse Namespace that has all the arguments
+    :param search_texts: texts to search
+    """
+    if args.group:
+        table = Table("Search", "Group", "Email", "Maintainers")
+        for group, info in resolve_groups(args.osc_instance, search_texts):
+            if info is None:
+                table.add_row(group, NOT_FOUND, "", "")
+            else:
+                table.add_row(
+                    group,
+                    info["Group"],
+                    info["Email"],
+                    ", ".join(info["Maintainers"]),
+                )
+    else:
+        field = get_search_field(args.login, args.email, args.name)
+        table = Table("Search", *PERSON_FIELDS)
+        for search_text, people in resolve_users(
+            args.osc_instance, search_texts, field
+        ):
+            if not people:
+                table.add_row(search_text, NOT_FOUND, "", "", "")
+            for info in people:
+                table.add_row(search_text, *info.values())
+    Console().print(table)
@@ -0,0 +1,162 @@
+import os
+import sqlite3
+import time
+from typing import Optional
+
+from sle_package.utils.cache import get_cache_dir
+from sle_package.utils.logger import logger_setup
+from sle_package.utils.obs import normalize_api_url
+
+
+log = logger_setup(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS requests (
+    api TEXT NOT NULL,
+    project TEXT NOT NULL,
+    id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    package TEXT NOT NULL,
+    accepted TEXT NOT NULL,
+    PRIMARY KEY (api, project, id, type, package)
+);
+CREATE INDEX IF NOT EXISTS requests_accepted ON requests (api, project, accepted);
+CREATE TABLE IF NOT EXISTS syncs (
+    api TEXT NOT NULL,
+    project TEXT NOT NULL,
+    high_water TEXT NOT NULL,
+    synced REAL NOT NULL,
+    PRIMARY KEY (api, project)
+);
+"""
+
+
+class RequestArchive:
+    """
+    Local archive of the accepted requests of OBS projects, stored in SQLite.
+    It remembers the acceptance time of the newest archived request of each
+    project (the high-water mark) so a sync only downloads the newer ones.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        :param path: SQLite database file
+        """
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self._db.close()
+
+    def high_water(self, api_url: str, project: str) -> Optional[str]:
+        """
+        Acceptance time of the newest archived request of a project.
+
+        :param api_url: OBS instance
+        :param project: OBS project
+        :return: ISO timestamp or None if the project was never synced
+        """
+        row = self._db.execute(
+            "SELECT high_water FROM syncs WHERE api = ? AND project = ?",
+            (normalize_api_url(api_url), project),
+        ).fetchone()
+        return row[0] if row else None
+
+    def store(
+        self,
+        api_url: str,
+        project: str,
+        requests: list[dict[str, str]],
+        full: bool = False,
+    ) -> None:
+        """
+        Store the requests of a sync and move the high-water mark, in a single
+        transaction.
+
+        :param api_url: OBS instance
+        :param project: OBS project
+        :param requests: list of dict with id, type, when and package
+        :param full: replace all the archived requests of the project
+        """
+        api = normalize_api_url(api_url)
+        high_water = "" if full else self.high_water(api, project) or ""
+        for request in requests:
+            high_water = max(high_water, request["when"])
+        try:
+            self._db.execute("BEGIN IMMEDIATE")
+            if full:
+                self._db.execute(
+                    "DELETE FROM requests WHERE api = ? AND project = ?",
+                    (api, project),
+                )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO requests VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (
+                        api,
+                        project,
+                        request["id"],
+                        request["type"],
+                        request["package"],
+                        request["when"],
+                    )
+                    for request in requests
+                ),
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO syncs VALUES (?, ?, ?, ?)",
+                (api, project, high_water, time.time()),
+            )
+            self._db.execute("COMMIT")
+        except sqlite3.Error as e:
+            if self._db.in_transaction:
+                self._db.execute("ROLLBACK")
+            raise RuntimeError(
+                f"Failed to archive the requests of {project}: {e}"
+            ) from e
+
+    def query(
+        self,
+        api_url: str,
+        project: str,
+        request_types: list[str],
+        since: str,
+        until: str = "",
+    ) -> list[dict[str, str]]:
+        """
+        Return the archived requests accepted in a time window.
+
+        :param api_url: OBS instance
+        :param project: OBS project
+        :param request_types: request types, e.g. submit and delete
+        :param since: first ISO date or timestamp, included
+        :param until: last ISO date or timestamp, excluded, no limit if empty
+        :return: list of dict with id, type, when and package, sorted by time
+        """
+        types = ", ".join("?" for _ in request_types)
+        rows = self._db.execute(
+            "SELECT id, type, accepted, package FROM requests "
+            f"WHERE api = ? AND project = ? AND type IN ({types}) "
+            "AND accepted >= ? AND (? = '' OR accepted < ?) "
+            "ORDER BY accepted, id",
+            (normalize_api_url(api_url), project, *request_types, since, until, until),
+        )
+        return [
+            {"id": request_id, "type": type_, "when": when, "package": package}
+            for request_id, type_, when, package in rows
+        ]
+
+
+def get_archive() -> RequestArchive:
+    """
+    Return the request archive in the XDG cache dir.
+
+    :return: request archive
+    """
+    path = os.path.join(get_cache_dir(), "requests.sqlite")
+    try:
+        return RequestArchive(path)
+    except sqlite3.Error as e:
+        raise RuntimeError(f"Failed to open the request archive {path}: {e}") from e
@@ -0,0 +1,278 @@
+import atexit
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+from sle_package.utils.logger import logger_setup
+
+
+log = logger_setup(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    body BLOB NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    stored REAL NOT NULL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+"""
+
+
+def get_cache_dir() -> str:
+    """
+    Return the XDG cache directory of sle_tools, creating it if needed.
+
+    :return: cache directory
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    path = os.path.join(base, "sle_tools")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class CacheEntry:
+    """
+    Cached response body and its validators.
+    """
+
+    def __init__(
+        self,
+        body: bytes,
+        etag: Optional[str],
+        last_modified: Optional[str],
+        stored: float,
+    ) -> None:
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored = stored
+
+    def validators(self) -> dict[str, str]:
+        """
+        Headers for a conditional request revalidating this entry.
+        """
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """
+    On-disk cache of API responses with per endpoint TTL, stored in SQLite so
+    several processes can share it, and evicted by least recent use when it
+    exceeds max_size bytes. The access times of the hits are kept in memory
+    and written with the next stored response or by flush().
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_size: int,
+        ttls: list[tuple[str, int]],
+        default_ttl: int = 0,
+        patterns: Optional[list[tuple[re.Pattern, int]]] = None,
+    ) -> None:
+        """
+        :param path: SQLite database file
+        :param max_size: size budget of the stored bodies in bytes
+        :param ttls: list of (path prefix, seconds), the longest prefix wins
+        :param default_ttl: seconds for the paths without prefix, 0 disables caching
+        :param patterns: list of (path regular expression, seconds), checked
+                         before the prefixes, the first match wins
+        """
+        self.path = path
+        self.max_size = max_size
+        self.ttls = sorted(ttls, key=lambda ttl: len(ttl[0]), reverse=True)
+        self.default_ttl = default_ttl
+        self.patterns = patterns or []
+        self._lock = threading.Lock()
+        # key -> access time of the hits not written yet
+        self._accessed: dict[str, float] = {}
+        self._db = sqlite3.connect(
+            path, timeout=60, isolation_level=None, check_same_thread=False
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    def ttl(self, path: str) -> int:
+        """
+        Time to live of the responses of an API path.
+
+        :param path: API path, e.g. /search/owner
+        :return: seconds, 0 if it must not be cached
+        """
+        path = "/" + path.lstrip("/")
+        for pattern, seconds in self.patterns:
+            if pattern.search(path):
+                return seconds
+        for prefix, seconds in self.ttls:
+            if path.startswith(prefix):
+                return seconds
+        return self.default_ttl
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """
+        Return the cached entry of a key, marking it as recently used.
+
+        :param key: full request URL
+        :return: entry or None
+        """
+        with self._lock:
+            try:
+                row = self._db.execute(
+                    "SELECT body, etag, last_modified, stored FROM responses WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                if row is None:
+                    return None
+            except sqlite3.Error as e:
+                log.warning("Failed to read the cache of %s: %s", key, e)
+                return None
+            self._accessed[key] = time.time()
+        return CacheEntry(*row)
+
+    def is_fresh(self, entry: CacheEntry, ttl: int) -> bool:
+        """
+        Check if an entry is younger than its time to live.
+        """
+        return time.time() - entry.stored < ttl
+
+    def revalidated(self, key: str) -> None:
+        """
+        Restart the time to live of an entry confirmed by the server.
+
+        :param key: full request URL
+        """
+        now = time.time()
+        with self._lock:
+            try:
+                self._db.execute(
+                    "UPDATE responses SET stored = ?, accessed = ? WHERE key = ?",
+                    (now, now, key),
+                )
+            except sqlite3.Error as e:
+                log.warning("Failed to revalidate the cache of %s: %s", key, e)
+
+    def put(
+        self,
+        key: str,
+        body: bytes,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        """
+        Store a response and evict the least recently used entries over budget.
+
+        :param key: full request URL
+        :param body: response body
+        :param etag: ETag header of the response
+        :param last_modified: Last-Modified header of the response
+        """
+        if len(body) > self.max_size:
+            return
+        now = time.time()
+        with self._lock:
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, body, etag, last_modified, now, now, len(body)),
+                )
+                # the eviction needs the recent hits
+                self._write_accessed()
+                self._evict()
+                self._db.execute("COMMIT")
+            except sqlite3.Error as e:
+                if self._db.in_transaction:
+                    self._db.execute("ROLLBACK")
+                log.warning("Failed to cache %s: %s", key, e)
+
+    def flush(self) -> None:
+        """
+        Write the access times of the hits, so that the next runs do not
+        evict the entries used by this one first.
+        """
+        with self._lock:
+            if not self._accessed:
+                return
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+                self._write_accessed()
+                self._db.execute("COMMIT")
+            except sqlite3.Error as e:
+                if self._db.in_transaction:
+                    self._db.execute("ROLLBACK")
+                log.warning("Failed to update the cache access times: %s", e)
+
+    def _write_accessed(self) -> None:
+        """
+        Write the pending access times in a single statement, must be called
+        with the lock held.
+        """
+        self._db.executemany(
+            "UPDATE responses SET accessed = ? WHERE key = ?",
+            [(accessed, key) for key, accessed in self._accessed.items()],
+        )
+        self._accessed.clear()
+
+    def _evict(self) -> None:
+        """
+        Delete the least recently used entries until the budget is respected,
+        must be called inside a transaction.
+        """
+        (total,) = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        excess = total - self.max_size
+        if excess <= 0:
+            return
+        victims = []
+        for key, size in self._db.execute(
+            "SELECT key, size FROM responses ORDER BY accessed"
+        ):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        log.debug(">> cache eviction of %s entries", len(victims))
+        self._db.executemany("DELETE FROM responses WHERE key = ?", victims)
+
+
+def build_cache(cache_config: Any) -> Optional[ResponseCache]:
+    """
+    Create the response cache from the cache configuration.
+
+    :param cache_config: config.cache
+    :return: response cache or None if it is disabled
+    """
+    if not cache_config or not cache_config.enabled:
+        return None
+    ttls = [(ttl.prefix, ttl.seconds) for ttl in cache_config.ttl if not ttl.pattern]
+    patterns = []
+    for ttl in cache_config.ttl:
+        if not ttl.pattern:
+            continue
+        try:
+            patterns.append((re.compile(ttl.pattern), ttl.seconds))
+        except re.error as e:
+            log.warning("Ignoring the cache ttl pattern %s: %s", ttl.pattern, e)
+    path = os.path.join(get_cache_dir(), "responses.sqlite")
+    try:
+        cache = ResponseCache(
+            path, cache_config.max_size, ttls, cache_config.default_ttl, patterns
+        )
+    except sqlite3.Error as e:
+        log.warning("Response cache %s disabled: %s", path, e)
+        return None
+    atexit.register(cache.flush)
+    return cache
@@ -0,0 +1,302 @@
+import functools
+import hashlib
+import io
+import json
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Optional, Union
+from urllib.parse import parse_qsl, quote, unquote, urlencode, urlsplit, urlunsplit
+
+from sle_package.utils.logger import logger_setup
+
+
+if TYPE_CHECKING:
+    from requests.adapters import HTTPAdapter
+
+
+log = logger_setup(__name__)
+
+INTERACTIONS_FILE = "interactions.jsonl"
+BODIES_DIR = "bodies"
+DEFAULT_PORTS = {"http": 80, "https": 443}
+# response headers that do not describe the recorded, already decoded, body
+SKIPPED_HEADERS = {
+    "content-encoding",
+    "content-length",
+    "set-cookie",
+    "transfer-encoding",
+}
+
+_cassette: Optional["Cassette"] = None
+
+
+class CassetteMiss(RuntimeError):
+    """
+    Request not found in the cassette.
+    """
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize a URL to match the same request, e.g.
+    "HTTPS://api.suse.de:443/search/request?b=1&a=2" ->
+    "https://api.suse.de/search/request?a=2&b=1"
+
+    :param url: URL
+    :return: URL with lower case scheme and host, no default port, a single
+             quoting and sorted query parameters
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc += f":{parts.port}"
+    path = quote(unquote(parts.path), safe="/:@") or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+def http_key(method: str, url: str, body: Union[bytes, str, None] = None) -> str:
+    """
+    Key of a HTTP request in a cassette: method, normalized URL and the hash
+    of the body, if any.
+    """
+    key = f"{method.upper()} {normalize_url(url)}"
+    if body:
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        key += f" {hashlib.sha256(body).hexdigest()[:16]}"
+    return key
+
+
+class Cassette:
+    """
+    Directory with the HTTP requests of a run and their responses, to replay
+    the run without network.
+
+    interactions.jsonl has an interaction per line and the bodies are stored
+    once per content in bodies/<sha256>. The interactions of the same key are
+    replayed in the recorded order, the last one is repeated when more are
+    requested.
+    """
+
+    def __init__(self, path: str, record: bool = False) -> None:
+        """
+        :param path: cassette directory
+        :param record: record a new cassette, replacing the existing one,
+                       instead of replaying it
+        """
+        self.path = path
+        self.record = record
+        self._lock = threading.Lock()
+        self._interactions: dict[str, list[dict]] = {}
+        self._replayed: dict[str, int] = {}
+        self._file = None
+        index = os.path.join(path, INTERACTIONS_FILE)
+        try:
+            if record:
+                os.makedirs(os.path.join(path, BODIES_DIR), exist_ok=True)
+                self._file = open(index, "w", encoding="utf-8")
+                return
+            with open(index, encoding="utf-8") as f:
+                for line in f:
+                    interaction = json.loads(line)
+                    self._interactions.setdefault(interaction["key"], []).append(
+                        interaction
+                    )
+        except (OSError, ValueError) as e:
+            raise RuntimeError(f"Failed to open the cassette {path}: {e}") from e
+        log.debug(">> %d interactions in %s", len(self._interactions), index)
+
+    def close(self) -> None:
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def _write_body(self, content: bytes) -> str:
+        digest = hashlib.sha256(content).hexdigest()
+        path = os.path.join(self.path, BODIES_DIR, digest)
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}"
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        return digest
+
+    def _read_body(self, digest: str) -> bytes:
+        with open(os.path.join(self.path, BODIES_DIR, digest), "rb") as f:
+            return f.read()
+
+    def _add(self, interaction: dict) -> None:
+        # written at once, a failed run keeps the interactions until the failure
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(json.dumps(interaction) + "\n")
+            self._file.flush()
+
+    def _next(self, key: str) -> dict:
+        with self._lock:
+            interactions = self._interactions.get(key)
+            if not interactions:
+                raise CassetteMiss(f"{key} not recorded in the cassette {self.path}")
+            index = self._replayed.get(key, 0)
+            self._replayed[key] = index + 1
+            return interactions[min(index, len(interactions) - 1)]
+
+    def record_http(
+        self,
+        method: str,
+        url: str,
+        body: Union[bytes, str, None],
+        status: int = 0,
+        reason: str = "",
+        headers: Optional[dict] = None,
+        content: bytes = b"",
+        error: str = "",
+    ) -> None:
+        """
+        Record a HTTP request and its response, or the error raised instead.
+        The request headers (e.g. the credentials) are not recorded.
+        """
+        interaction: dict[str, Any] = {
+            "kind": "http",
+            "key": http_key(method, url, body),
+            "url": url,
+        }
+        if error:
+            interaction["error"] = error
+        else:
+            interaction.update(
+                {
+                    "status": status,
+                    "reason": reason,
+                    "headers": {
+                        name: value
+                        for name, value in (headers or {}).items()
+                        if name.lower() not in SKIPPED_HEADERS
+                    },
+                    "body": self._write_body(content),
+                }
+            )
+        self._add(interaction)
+
+    def replay_http(
+        self, method: str, url: str, body: Union[bytes, str, None] = None
+    ) -> dict:
+        """
+        Return the next recorded response of a HTTP request.
+
+        :return: dict with status, reason, headers and content, or error
+        :raise CassetteMiss: the request was not recorded
+        """
+        interaction = self._next(http_key(method, url, body))
+        if "error" in interaction:
+            return {"error": interaction["error"]}
+        return {
+            "status": interaction["status"],
+            "reason": interaction["reason"],
+            "headers": interaction["headers"],
+            "content": self._read_body(interaction["body"]),
+        }
+
+
+def configure(path: Optional[str], record: bool = False) -> Optional[Cassette]:
+    """
+    Record the run to, or replay it from, a cassette. The HTTP clients
+    created from now on use it.
+
+    :param path: cassette directory, None to stop using a cassette
+    :param record: record instead of replay
+    :return: cassette
+    """
+    global _cassette
+    if _cassette is not None:
+        _cassette.close()
+    _cassette = Cassette(path, record) if path else None
+    return _cassette
+
+
+@functools.cache
+def _adapter_class() -> type:
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.response import HTTPResponse
+
+    class CassetteAdapter(HTTPAdapter):
+        """
+        Transport adapter recording the responses to or replaying them from a
+        cassette, the whole body is read so the streamed responses are
+        recorded too.
+        """
+
+        def __init__(self, cassette: Cassette, **kwargs: Any) -> None:
+            super().__init__(**kwargs)
+            self.cassette = cassette
+
+        def send(self, request, **kwargs):  # type: ignore
+            if self.cassette.record:
+                try:
+                    response = super().send(request, **kwargs)
+                    content = response.content
+                except requests.RequestException as e:
+                    self.cassette.record_http(
+                        request.method, request.url, request.body, error=str(e)
+                    )
+                    raise
+                self.cassette.record_http(
+                    request.method,
+                    request.url,
+                    request.body,
+                    response.status_code,
+                    response.reason,
+                    dict(response.headers),
+                    content,
+                )
+                recorded = {
+                    "status": response.status_code,
+                    "reason": response.reason,
+                    "headers": dict(response.headers),
+                    "content": content,
+                }
+            else:
+                try:
+                    recorded = self.cassette.replay_http(
+                        request.method, request.url, request.body
+                    )
+                except CassetteMiss as e:
+                    raise requests.ConnectionError(str(e), request=request) from e
+                if "error" in recorded:
+                    raise requests.ConnectionError(recorded["error"], request=request)
+            headers = {
+                name: value
+                for name, value in recorded["headers"].items()
+                if name.lower() not in SKIPPED_HEADERS
+            }
+            headers["Content-Length"] = str(len(recorded["content"]))
+            raw = HTTPResponse(
+                body=io.BytesIO(recorded["content"]),
+                headers=headers,
+                status=recorded["status"],
+                reason=recorded["reason"],
+                preload_content=False,
+                decode_content=False,
+            )
+            return self.build_response(request, raw)
+
+    return CassetteAdapter
+
+
+def http_adapter(**kwargs: Any) -> "HTTPAdapter":
+    """
+    Return a requests transport adapter using the cassette of the run, or a
+    plain HTTPAdapter if there is none.
+
+    :param kwargs: HTTPAdapter arguments, e.g. pool_maxsize
+    :return: transport adapter
+    """
+    if _cassette is None:
+        from requests.adapters import HTTPAdapter
+
+        return HTTPAdapter(**kwargs)
+    return _adapter_class()(_cassette, **kwargs)
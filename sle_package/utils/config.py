@@ -0,0 +1,275 @@
+import dataclasses
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any
+
+from sle_package.utils.cache import get_cache_dir
+from sle_package.utils.logger import logger_setup
+
+
+log = logger_setup(__name__)
+
+# bump when the snapshot layout changes
+SNAPSHOT_VERSION = 2
+
+
+# The sections and keys added after the first config.lua have defaults, so
+# that an older config.lua keeps working. The derived keys name the Lua
+# function they come from in their metadata.
+
+
+@dataclass
+class CommonConfig:
+    api_url: str
+    default_project: str
+    default_product: str
+    debug: bool = False
+
+
+@dataclass
+class CacheTtl:
+    seconds: int
+    # API path prefix, or regular expression searched in the API path
+    prefix: str = ""
+    pattern: str = ""
+
+
+@dataclass
+class CacheConfig:
+    enabled: bool = True
+    max_size: int = 104857600
+    # nothing is cached without ttl rules
+    default_ttl: int = 0
+    ttl: list[CacheTtl] = field(default_factory=list)
+
+
+@dataclass
+class RepoInfo:
+    name: str
+    pattern: str
+    invalid_extensions: list[str]
+    invalid_start: list[str]
+
+
+@dataclass
+class ArtifactsConfig:
+    repositories: list[str]
+    images_pattern: str
+    products_pattern: str
+    invalid_extensions: list[str]
+    invalid_start: str
+    # result of get_repo_info for every repository
+    repo_infos: list[RepoInfo] = field(metadata={"lua": "get_repo_info"})
+    jobs: int = 8
+
+
+@dataclass
+class ReviewsConfig:
+    jobs: int = 8
+    prefetch: int = 3
+
+
+@dataclass
+class PrjconfConfig:
+    ignored_repositories: list[str] = field(default_factory=lambda: ["ports"])
+    ignored_codes: list[str] = field(
+        default_factory=lambda: ["excluded", "disabled", "unknown"]
+    )
+
+
+@dataclass
+class PackagesConfig:
+    default_productcomposer: str
+    # results of get_build_project and get_productcomposer
+    build_project: str = field(metadata={"lua": "get_build_project"})
+    productcomposer: str = field(metadata={"lua": "get_productcomposer"})
+
+
+@dataclass
+class PublishConfig:
+    repositories: list[str] = field(default_factory=lambda: ["images"])
+    interval: int = 30
+    max_interval: int = 600
+
+
+@dataclass
+class Config:
+    common: CommonConfig
+    cache: CacheConfig
+    artifacts: ArtifactsConfig
+    reviews: ReviewsConfig
+    prjconf: PrjconfConfig
+    packages: PackagesConfig
+    publish: PublishConfig
+    extra: dict = field(default_factory=dict)
+
+
+def lua_to_python(value: Any) -> Any:
+    """
+    Convert Lua values to python, tables with keys 1..n become lists and
+    functions are dropped.
+
+    :param value: Lua value
+    :return: python value
+    """
+    import lupa  # type: ignore
+
+    lua_type = lupa.lua_type(value)
+    if lua_type == "function":
+        return None
+    if lua_type != "table":
+        return value
+    items = {
+        key: lua_to_python(item)
+        for key, item in value.items()
+        if lupa.lua_type(item) != "function"
+    }
+    if list(items) == list(range(1, len(items) + 1)):
+        return list(items.values())
+    return items
+
+
+def evaluate_lua_config(config_dir: str) -> dict:
+    """
+    Evaluate config.lua with lupa, including its functions, into plain data.
+
+    :param config_dir: directory of config.lua
+    :return: configuration as python data
+    """
+    from lupa import LuaError, LuaRuntime  # type: ignore
+
+    # Load the Lua runtime and modify the package path
+    lua = LuaRuntime()
+    lua.execute(f'package.path = package.path .. ";{config_dir}/?.lua"')
+
+    try:
+        # Now you can require "config" (without the full path)
+        # it will return a tuple: lua table and full path to config file
+        config, _ = lua.require("config")
+        data = lua_to_python(config)
+        # the functions missing in an older config.lua are reported by
+        # build_config
+        artifacts, packages = config["artifacts"], config["packages"]
+        if artifacts and artifacts["get_repo_info"] and artifacts["repositories"]:
+            data["artifacts"]["repo_infos"] = [
+                lua_to_python(artifacts.get_repo_info(config, index))
+                for index in range(1, len(artifacts.repositories) + 1)
+            ]
+        if packages and packages["get_build_project"]:
+            data["packages"]["build_project"] = packages.get_build_project(config)
+        if packages and packages["get_productcomposer"]:
+            data["packages"]["productcomposer"] = packages.get_productcomposer(config)
+    except LuaError as e:
+        raise RuntimeError(f"Failed to evaluate {config_dir}/config.lua: {e}") from e
+    return data
+
+
+def build_section(cls: type, data: Any, section: str) -> Any:
+    """
+    Build a configuration dataclass, ignoring the keys it does not know.
+
+    :param cls: dataclass of the section
+    :param data: section as python data, a missing section is empty
+    :param section: section name, for the errors
+    :return: section
+    :raise RuntimeError: a key without default is missing
+    """
+    # an empty Lua table is converted to an empty list
+    data = data or {}
+    if not isinstance(data, dict):
+        raise RuntimeError(f"{section} must be a table in config.lua")
+    values = {}
+    for item in dataclasses.fields(cls):
+        if item.name in data:
+            values[item.name] = data[item.name]
+        elif (
+            item.default is dataclasses.MISSING
+            and item.default_factory is dataclasses.MISSING
+        ):
+            key = f"{section}.{item.metadata.get('lua', item.name)}"
+            raise RuntimeError(f"{key} is missing in config.lua")
+    return cls(**values)
+
+
+def build_config(data: dict) -> Config:
+    """
+    Build the typed configuration from plain data.
+
+    :param data: configuration as python data
+    :return: configuration
+    :raise RuntimeError: a key without default is missing
+    """
+    artifacts = dict(data.get("artifacts") or {})
+    if "repo_infos" in artifacts:
+        artifacts["repo_infos"] = [
+            build_section(RepoInfo, info, "artifacts.get_repo_info()")
+            for info in artifacts["repo_infos"]
+        ]
+    cache = dict(data.get("cache") or {})
+    cache["ttl"] = [
+        build_section(CacheTtl, ttl, "cache.ttl") for ttl in cache.get("ttl") or []
+    ]
+    known = {section.name for section in dataclasses.fields(Config)}
+    return Config(
+        common=build_section(CommonConfig, data.get("common"), "common"),
+        cache=build_section(CacheConfig, cache, "cache"),
+        artifacts=build_section(ArtifactsConfig, artifacts, "artifacts"),
+        reviews=build_section(ReviewsConfig, data.get("reviews"), "reviews"),
+        prjconf=build_section(PrjconfConfig, data.get("prjconf"), "prjconf"),
+        packages=build_section(PackagesConfig, data.get("packages"), "packages"),
+        publish=build_section(PublishConfig, data.get("publish"), "publish"),
+        extra={key: value for key, value in data.items() if key not in known},
+    )
+
+
+def snapshot_path(config_file: str) -> str:
+    """
+    Location of the compiled snapshot of a config file.
+    """
+    digest = hashlib.sha256(os.path.abspath(config_file).encode("utf-8")).hexdigest()
+    return os.path.join(get_cache_dir(), f"config-{digest[:16]}.json")
+
+
+def load_config(config_dir: str) -> Config:
+    """
+    Load config.lua, from the compiled snapshot when the file did not change
+    (same mtime, or same content hash), evaluating it with Lua otherwise.
+
+    :param config_dir: directory of config.lua
+    :return: configuration
+    """
+    config_file = os.path.join(config_dir, "config.lua")
+    stat = os.stat(config_file)
+    snapshot_file = snapshot_path(config_file)
+    snapshot = {}
+    try:
+        with open(snapshot_file, encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        pass
+    is_current = snapshot.get("version") == SNAPSHOT_VERSION
+    if is_current and snapshot.get("mtime_ns") == stat.st_mtime_ns:
+        return build_config(snapshot["config"])
+    with open(config_file, "rb") as f:
+        content_hash = hashlib.sha256(f.read()).hexdigest()
+    if is_current and snapshot.get("sha256") == content_hash:
+        data = snapshot["config"]
+    else:
+        log.debug(">> compiling %s", config_file)
+        data = evaluate_lua_config(config_dir)
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": content_hash,
+        "config": data,
+    }
+    tmp_file = f"{snapshot_file}.{os.getpid()}"
+    try:
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_file, snapshot_file)
+    except OSError as e:
+        log.warning("Failed to save the config snapshot %s: %s", snapshot_file, e)
+    return build_config(data)
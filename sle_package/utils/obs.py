@@ -0,0 +1,453 @@
+import configparser
+import io
+import os
+import threading
+import time
+import xml.etree.ElementTree as ET
+from typing import TYPE_CHECKING, Any, Generator, Optional
+from urllib.parse import urlsplit
+
+from sle_package.utils import cassette, profiler
+from sle_package.utils.cache import ResponseCache
+from sle_package.utils.logger import logger_setup
+
+
+if TYPE_CHECKING:
+    # the HTTP stack is imported on first use, it is slow to import and not
+    # needed for the help and the shell completion
+    from http.cookiejar import LWPCookieJar
+
+    import requests
+
+
+log = logger_setup(__name__)
+
+OSCRC_LOCATIONS = ["~/.config/osc/oscrc", "~/.oscrc"]
+COOKIEJAR_LOCATIONS = ["~/.local/state/osc/cookiejar", "~/.osc_cookiejar"]
+POOL_SIZE = 16
+TIMEOUT = 300
+
+_osc_config: Optional[str] = None
+_cache: Optional[ResponseCache] = None
+_refresh = False
+_clients: dict[str, "ObsClient"] = {}
+_clients_lock = threading.Lock()
+
+
+class ObsApiError(RuntimeError):
+    """
+    Error returned by the OBS API or raised while talking to it.
+    """
+
+    def __init__(self, message: str, status: int = 0) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def normalize_api_url(api_url: str) -> str:
+    """
+    Normalize an OBS API URL, e.g. "https://api.suse.de/" -> "https://api.suse.de"
+
+    :param api_url: OBS instance
+    :return: API URL without trailing slash
+    """
+    if "://" not in api_url:
+        api_url = f"https://{api_url}"
+    return api_url.rstrip("/")
+
+
+def find_oscrc(osc_config: Optional[str] = None) -> Optional[str]:
+    """
+    Find the oscrc to be used, following the same order as osc.
+
+    :param osc_config: explicit oscrc location
+    :return: path to the oscrc or None
+    """
+    candidates = [osc_config, os.environ.get("OSC_CONFIG")] + OSCRC_LOCATIONS
+    for candidate in candidates:
+        if candidate and os.path.isfile(os.path.expanduser(candidate)):
+            return os.path.expanduser(candidate)
+    return None
+
+
+def read_credentials(api_url: str, osc_config: Optional[str] = None) -> tuple:
+    """
+    Read the credentials of an OBS instance from the oscrc. A plain text
+    "pass" is read directly, the other passwords ("passx", keyring and the
+    other credentials managers) through osc when it is installed. The ssh key
+    and Kerberos authentications of osc are not supported, their session is
+    reused from the osc cookiejar, see load_cookiejar.
+
+    :param api_url: OBS instance
+    :param osc_config: explicit oscrc location
+    :return: tuple (user, password), both can be None
+    """
+    oscrc = find_oscrc(osc_config)
+    if not oscrc:
+        return None, None
+    parser = configparser.ConfigParser(interpolation=None)
+    parser.read(oscrc)
+    host = urlsplit(api_url).netloc
+    for section in parser.sections():
+        if normalize_api_url(section) == api_url or section == host:
+            user = parser.get(section, "user", fallback=None)
+            password = parser.get(section, "pass", fallback=None)
+            if not password:
+                return read_osc_credentials(api_url, oscrc, user)
+            log.debug(">> credentials for %s from %s", api_url, oscrc)
+            return user, password
+    return None, None
+
+
+def read_osc_credentials(api_url: str, oscrc: str, user: Optional[str]) -> tuple:
+    """
+    Read the credentials of an OBS instance with the credentials managers of
+    osc, if it is installed.
+
+    :param api_url: OBS instance
+    :param oscrc: path to the oscrc
+    :param user: user read from the oscrc
+    :return: tuple (user, password), the password is None if osc can not
+             read it
+    """
+    try:
+        import osc.conf  # type: ignore
+    except ImportError:
+        log.debug(">> osc not installed, no password for %s", api_url)
+        return user, None
+    try:
+        osc.conf.get_config(override_conffile=oscrc)
+        options = osc.conf.get_apiurl_api_host_options(api_url)
+        password = options["pass"]
+        # the password of a credentials manager is read when it is converted
+        password = str(password) if password is not None else None
+    except Exception as e:
+        # osc has its own errors, e.g. for a locked keyring
+        log.debug("osc failed to read the password of %s: %s", api_url, e)
+        return user, None
+    log.debug(">> credentials for %s from osc", api_url)
+    return options["user"] or user, password or None
+
+
+def load_cookiejar() -> "LWPCookieJar":
+    """
+    Load the osc session cookies, this allows reusing a session created
+    by osc with any of its authentication methods (e.g. ssh signatures).
+
+    :return: cookie jar
+    """
+    from http.cookiejar import LWPCookieJar
+
+    for location in COOKIEJAR_LOCATIONS:
+        path = os.path.expanduser(location)
+        if os.path.isfile(path):
+            jar = LWPCookieJar(path)
+            try:
+                jar.load(ignore_discard=True)
+                log.debug(">> cookies loaded from %s", path)
+                return jar
+            except OSError as e:
+                log.debug("Failed to load cookies from %s: %s", path, e)
+    return LWPCookieJar()
+
+
+class ObsClient:
+    """
+    Keep-alive, connection pooled HTTP client for the OBS API.
+    """
+
+    def __init__(
+        self,
+        api_url: str,
+        osc_config: Optional[str] = None,
+        cache: Optional[ResponseCache] = None,
+        refresh: bool = False,
+    ) -> None:
+        """
+        :param api_url: OBS instance
+        :param osc_config: oscrc location
+        :param cache: cache of the GET responses, None to disable it
+        :param refresh: revalidate the cached responses even if not expired
+        """
+        import requests
+
+        self.api_url = normalize_api_url(api_url)
+        self.cache = cache
+        self.refresh = refresh
+        self.session = requests.Session()
+        # records to or replays from the cassette of the run, if any
+        adapter = cassette.http_adapter(
+            pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(
+            {"Accept-Encoding": "gzip, deflate", "User-Agent": "sle_tools"}
+        )
+        self.session.cookies = load_cookiejar()  # type: ignore
+        user, password = read_credentials(self.api_url, osc_config)
+        if user and password:
+            self.session.auth = (user, password)
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Any] = None,
+        data: Optional[Any] = None,
+        stream: bool = False,
+        headers: Optional[dict] = None,
+        timeout: Optional[float] = None,
+    ) -> "requests.Response":
+        """
+        Send a request to the OBS API.
+
+        :param method: HTTP method
+        :param path: API path, e.g. /source/SUSE:SLFO:Main
+        :param params: query parameters, dict or list of tuples
+        :param data: request body
+        :param stream: do not read the response body upfront
+        :param headers: extra request headers
+        :param timeout: seconds to wait for the response, TIMEOUT if None
+        :return: response
+        """
+        import requests
+
+        url = f"{self.api_url}/{path.lstrip('/')}"
+        log.debug(">> %s %s %s", method, url, params)
+        started = time.perf_counter()
+        try:
+            response = self.session.request(
+                method,
+                url,
+                params=params,
+                data=data,
+                stream=stream,
+                headers=headers,
+                timeout=TIMEOUT if timeout is None else timeout,
+            )
+        except requests.RequestException as e:
+            self._profile(method, path, params, started, data, stream, error=str(e))
+            raise ObsApiError(f"{method} {url} failed: {e}") from e
+        self._profile(method, path, params, started, data, stream, response)
+        if response.status_code == 401:
+            response.close()
+            raise ObsApiError(
+                f"Not authorized on {self.api_url}, run osc once to refresh the "
+                "session (ssh key and Kerberos logins are only reused this way).",
+                response.status_code,
+            )
+        if not response.ok:
+            summary = response.text.strip()
+            response.close()
+            raise ObsApiError(
+                f"{method} {url} failed with {response.status_code}: {summary}",
+                response.status_code,
+            )
+        return response
+
+    def _profile(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Any],
+        started: float,
+        data: Optional[Any],
+        stream: bool,
+        response: Optional["requests.Response"] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        """
+        Record a request in the profile of the run, if it is profiled.
+        The time of the streamed responses does not include their body.
+        """
+        if profiler.get_profiler() is None:
+            return
+        details: dict[str, Any] = {"path": path}
+        if data:
+            details["bytes_out"] = len(data)
+        if response is not None:
+            details["status"] = response.status_code
+            if stream:
+                details["bytes_in"] = int(response.headers.get("Content-Length", 0))
+            else:
+                details["bytes_in"] = len(response.content)
+            if not response.ok:
+                details["error"] = response.reason
+        if error:
+            details["error"] = error
+        profiler.record(
+            "http", profiler.endpoint_name(method, path, params), started, details
+        )
+
+    def cache_key(self, path: str, params: Optional[Any] = None) -> str:
+        """
+        Cache key of a GET request: API URL, path and query.
+        """
+        import requests
+
+        url = f"{self.api_url}/{path.lstrip('/')}"
+        return str(requests.Request("GET", url, params=params).prepare().url)
+
+    def is_cached(self, path: str) -> bool:
+        """
+        Check if the GET responses of an API path are cached.
+        """
+        return self.cache is not None and self.cache.ttl(path) > 0
+
+    def fetch(self, path: str, params: Optional[Any] = None) -> bytes:
+        """
+        GET an API path and return the response body, served from the cache
+        while fresh and revalidated with ETag/Last-Modified when expired.
+        """
+        if self.cache is None or not self.is_cached(path):
+            return self.request("GET", path, params=params).content
+        started = time.perf_counter()
+        key = self.cache_key(path, params)
+        entry = self.cache.get(key)
+        if entry:
+            if not self.refresh and self.cache.is_fresh(entry, self.cache.ttl(path)):
+                log.debug(">> cache hit %s", key)
+                profiler.record(
+                    "cache",
+                    profiler.endpoint_name("GET", path, params),
+                    started,
+                    {"path": path, "bytes_in": len(entry.body)},
+                )
+                return entry.body
+            response = self.request(
+                "GET", path, params=params, headers=entry.validators()
+            )
+            if response.status_code == 304:
+                log.debug(">> cache revalidated %s", key)
+                self.cache.revalidated(key)
+                return entry.body
+        else:
+            response = self.request("GET", path, params=params)
+        self.cache.put(
+            key,
+            response.content,
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified"),
+        )
+        return response.content
+
+    def get(self, path: str, params: Optional[Any] = None) -> str:
+        """
+        GET an API path and return the response body as text.
+        """
+        return self.fetch(path, params=params).decode("utf-8")
+
+    def post(
+        self, path: str, params: Optional[Any] = None, data: Optional[Any] = None
+    ) -> str:
+        """
+        POST to an API path and return the response body as text.
+        """
+        return self.request("POST", path, params=params, data=data).text
+
+    def stream(self, path: str, params: Optional[Any] = None) -> Any:
+        """
+        GET an API path and return a file-like object with the decoded body,
+        suitable for incremental parsers like ElementTree.iterparse.
+        """
+        if self.is_cached(path):
+            return io.BytesIO(self.fetch(path, params=params))
+        response = self.request("GET", path, params=params, stream=True)
+        response.raw.decode_content = True
+        return response.raw
+
+
+def configure(
+    osc_config: Optional[str] = None,
+    cache: Optional[ResponseCache] = None,
+    refresh: bool = False,
+) -> None:
+    """
+    Set the oscrc and response cache used by the clients created from now on.
+
+    :param osc_config: oscrc location
+    :param cache: cache of the GET responses, None to disable it
+    :param refresh: revalidate the cached responses even if not expired
+    """
+    global _osc_config, _cache, _refresh
+    with _clients_lock:
+        _osc_config = osc_config
+        _cache = cache
+        _refresh = refresh
+        _clients.clear()
+
+
+def get_client(api_url: str) -> ObsClient:
+    """
+    Return the shared client of an OBS instance, creating it on first use.
+
+    :param api_url: OBS instance
+    :return: OBS client
+    """
+    key = normalize_api_url(api_url)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = ObsClient(key, _osc_config, _cache, _refresh)
+        return _clients[key]
+
+
+def iter_search_requests(
+    api_url: str, match: str, page_size: int = 0
+) -> Generator[ET.Element, None, None]:
+    """
+    Search the requests matching an XPath expression and stream them, without
+    keeping the parsed document in memory. A yielded request element is only
+    valid until the next one is read.
+
+    :param api_url: OBS instance
+    :param match: XPath expression, e.g. "state/@name='review'"
+    :param page_size: requests per query, for the searches too big for a
+                      single query, 0 for one query
+    :return: generator of request elements
+    """
+    params = {"match": match, "withhistory": 0, "withfullhistory": 0}
+    if not page_size:
+        yield from stream_search_requests(api_url, params)
+        return
+    # OBS returns the requests sorted by id: a page starts after the last id
+    # of the previous one, so the requests changing state during the search
+    # do not shift the pages as an offset would
+    last_id = 0
+    while True:
+        count = 0
+        first_id = last_id
+        page_match = f"({match}) and @id>{last_id}" if last_id else match
+        for request in stream_search_requests(
+            api_url, {**params, "match": page_match, "limit": page_size}
+        ):
+            count += 1
+            request_id = int(request.get("id") or 0)
+            if request_id > last_id:
+                last_id = request_id
+                yield request
+        if count < page_size or last_id == first_id:
+            return
+
+
+def stream_search_requests(
+    api_url: str, params: dict
+) -> Generator[ET.Element, None, None]:
+    """
+    Stream the request elements of a single /search/request query.
+
+    :param api_url: OBS instance
+    :param params: query parameters
+    :return: generator of request elements
+    """
+    stream = get_client(api_url).stream("/search/request", params=params)
+    try:
+        context = ET.iterparse(stream, events=("start", "end"))
+        _, root = next(context)
+        for event, elem in context:
+            if event == "end" and elem.tag == "request":
+                yield elem
+                # drop the processed request
+                root.clear()
+    finally:
+        stream.close()
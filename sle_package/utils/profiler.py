@@ -0,0 +1,239 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from typing import Any, Generator, Optional
+
+from sle_package.utils.logger import logger_setup
+
+
+log = logger_setup(__name__)
+
+# width of the summary table when stderr is not a terminal
+SUMMARY_WIDTH = 120
+# query parameters that select what an endpoint does
+ENDPOINT_PARAMS = {"cmd", "view"}
+
+_profiler: Optional["Profiler"] = None
+
+
+class Profiler:
+    """
+    Records the HTTP requests, the cache hits and the named phases of a run,
+    to print a summary and write a Chrome trace.
+    """
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.events: list[dict] = []
+        self._lock = threading.Lock()
+
+    def add(
+        self,
+        kind: str,
+        name: str,
+        started: float,
+        duration: float,
+        details: Optional[dict] = None,
+    ) -> None:
+        """
+        Record a finished event.
+
+        :param kind: http, cache or phase
+        :param name: name to group the events, e.g. "GET /source/*"
+        :param started: time.perf_counter() at the start
+        :param duration: seconds
+        :param details: e.g. url, bytes_in, bytes_out and status
+        """
+        event = {
+            "kind": kind,
+            "name": name,
+            "started": started,
+            "duration": duration,
+            "thread": threading.get_ident(),
+            "details": details or {},
+        }
+        with self._lock:
+            self.events.append(event)
+
+    def summary(self) -> list[dict]:
+        """
+        Aggregate the events per kind and name.
+
+        :return: list of dict with kind, name, count, total, p50, p95,
+                 bytes_in, bytes_out and errors, slowest total first
+        """
+        groups: dict[tuple[str, str], list[dict]] = {}
+        for event in self.events:
+            groups.setdefault((event["kind"], event["name"]), []).append(event)
+        rows = []
+        for (kind, name), events in groups.items():
+            durations = sorted(event["duration"] for event in events)
+            rows.append(
+                {
+                    "kind": kind,
+                    "name": name,
+                    "count": len(events),
+                    "total": sum(durations),
+                    "p50": percentile(durations, 50),
+                    "p95": percentile(durations, 95),
+                    "bytes_in": sum(e["details"].get("bytes_in", 0) for e in events),
+                    "bytes_out": sum(e["details"].get("bytes_out", 0) for e in events),
+                    "errors": sum(1 for e in events if e["details"].get("error")),
+                }
+            )
+        return sorted(rows, key=lambda row: row["total"], reverse=True)
+
+    def print_summary(self) -> None:
+        """
+        Print the summary table on stderr.
+        """
+        from rich.console import Console
+        from rich.table import Table
+
+        table = Table(
+            title=f"Profile ({time.perf_counter() - self.start:.2f}s)",
+            title_justify="left",
+        )
+        for column in ["Kind", "Name"]:
+            table.add_column(column, no_wrap=True)
+        for column in ["Count", "Total", "p50", "p95", "In", "Out", "Errors"]:
+            table.add_column(column, justify="right", no_wrap=True)
+        for row in self.summary():
+            table.add_row(
+                row["kind"],
+                row["name"],
+                str(row["count"]),
+                f"{row['total']:.3f}s",
+                f"{row['p50'] * 1000:.1f}ms",
+                f"{row['p95'] * 1000:.1f}ms",
+                format_size(row["bytes_in"]),
+                format_size(row["bytes_out"]),
+                str(row["errors"]),
+            )
+        console = Console(stderr=True)
+        if not console.is_terminal:
+            # do not cut the table when stderr is redirected
+            console = Console(stderr=True, width=SUMMARY_WIDTH)
+        console.print(table)
+
+    def write_trace(self, path: str) -> None:
+        """
+        Write the events in the Chrome trace format, for chrome://tracing or
+        https://ui.perfetto.dev
+
+        :param path: JSON file
+        """
+        pid = os.getpid()
+        trace = [
+            {
+                "name": event["name"],
+                "cat": event["kind"],
+                "ph": "X",
+                "ts": (event["started"] - self.start) * 1e6,
+                "dur": event["duration"] * 1e6,
+                "pid": pid,
+                "tid": event["thread"],
+                "args": event["details"],
+            }
+            for event in self.events
+        ]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+
+
+def percentile(values: list[float], percent: int) -> float:
+    """
+    Nearest rank percentile of sorted values.
+    """
+    if not values:
+        return 0.0
+    index = max(0, -(-len(values) * percent // 100) - 1)
+    return values[index]
+
+
+def format_size(size: int) -> str:
+    if not size:
+        return "-"
+    for unit in ["B", "KiB", "MiB"]:
+        if size < 1024:
+            return f"{size:.0f}{unit}"
+        size /= 1024  # type: ignore
+    return f"{size:.1f}GiB"
+
+
+def enable() -> Profiler:
+    """
+    Start profiling the run.
+
+    :return: profiler
+    """
+    global _profiler
+    _profiler = Profiler()
+    return _profiler
+
+
+def get_profiler() -> Optional[Profiler]:
+    """
+    Return the profiler of the run, None if it is not profiled.
+    """
+    return _profiler
+
+
+def record(
+    kind: str, name: str, started: float, details: Optional[dict] = None
+) -> None:
+    """
+    Record an event that started at time.perf_counter() started and just
+    finished, nothing is done if the run is not profiled.
+    """
+    if _profiler is not None:
+        _profiler.add(kind, name, started, time.perf_counter() - started, details)
+
+
+@contextlib.contextmanager
+def phase(name: str) -> Generator[None, None, None]:
+    """
+    Time a named phase of the run.
+
+    :param name: phase name, e.g. list_requests
+    """
+    if _profiler is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record("phase", name, started)
+
+
+def endpoint_name(method: str, path: str, params: Optional[Any] = None) -> str:
+    """
+    Name of the API endpoint of a request, so that the requests on different
+    projects or packages are grouped: the project, package, repository... of
+    the path are replaced by "*", the "_" names (e.g. _result) and the search
+    paths are kept, and so are the cmd and view parameters, e.g.
+    "GET /build/*/_result?view=summary" or
+    "POST /request/*?cmd=changereviewstate".
+
+    :param method: HTTP method
+    :param path: API path
+    :param params: query parameters, dict or list of tuples
+    :return: endpoint name
+    """
+    segments = path.strip("/").split("/")
+    if segments[0] != "search":
+        segments[1:] = [
+            segment if segment.startswith("_") else "*" for segment in segments[1:]
+        ]
+    name = f"{method} /{'/'.join(segments)}"
+    if isinstance(params, dict):
+        params = params.items()
+    query = sorted(
+        f"{key}={value}" for key, value in params or [] if key in ENDPOINT_PARAMS
+    )
+    if query:
+        name += f"?{'&'.join(query)}"
+    return name
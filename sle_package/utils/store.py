@@ -0,0 +1,133 @@
+import hashlib
+import marshal
+import os
+import re
+import tempfile
+import time
+from typing import Any, Optional
+
+from sle_package.utils import profiler
+from sle_package.utils.cache import get_cache_dir
+from sle_package.utils.logger import logger_setup
+from sle_package.utils.obs import normalize_api_url
+
+
+log = logger_setup(__name__)
+
+# revision numbers and srcmd5 never change their content
+PINNED_REVISION = re.compile(r"^([0-9]+|[0-9a-f]{32})$")
+
+_store: Optional["ContentStore"] = None
+
+
+def is_pinned(revision: str) -> bool:
+    """
+    Check if a revision always refers to the same content.
+
+    :param revision: revision number, srcmd5 or empty for the latest
+    :return: True for revision numbers and srcmd5
+    """
+    return bool(revision and PINNED_REVISION.match(revision))
+
+
+class ContentStore:
+    """
+    Permanent on-disk store of immutable content, e.g. source files at a
+    fixed revision and the data parsed from them. Entries are never expired.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        :param path: store directory
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key: tuple, kind: str) -> str:
+        digest = hashlib.sha256("\0".join(map(str, key)).encode("utf-8")).hexdigest()
+        return os.path.join(self.path, digest[:2], f"{digest}.{kind}")
+
+    def get(self, key: tuple, kind: str = "raw") -> Optional[bytes]:
+        """
+        Return the stored bytes of a key.
+
+        :param key: tuple identifying the content, e.g. (api, project, package, file, rev)
+        :param kind: kind of the content, e.g. raw or parsed
+        :return: content or None
+        """
+        started = time.perf_counter()
+        try:
+            with open(self._file(key, kind), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        details = {"key": "/".join(map(str, key[1:])), "bytes_in": len(data)}
+        profiler.record("cache", f"store {kind}", started, details)
+        return data
+
+    def put(self, key: tuple, data: bytes, kind: str = "raw") -> None:
+        """
+        Store bytes of a key, atomically so concurrent runs never see partial
+        content.
+
+        :param key: tuple identifying the content
+        :param data: content
+        :param kind: kind of the content, e.g. raw or parsed
+        """
+        path = self._file(key, kind)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            log.warning("Failed to store %s: %s", key, e)
+
+    def get_object(self, key: tuple, kind: str) -> Any:
+        """
+        Return a stored python object (marshal format, fast to load).
+
+        :param key: tuple identifying the content
+        :param kind: kind of the content
+        :return: object or None
+        """
+        data = self.get(key, kind)
+        if data is None:
+            return None
+        try:
+            return marshal.loads(data)
+        except (EOFError, ValueError, TypeError) as e:
+            log.warning("Ignoring invalid stored %s: %s", key, e)
+            return None
+
+    def put_object(self, key: tuple, obj: Any, kind: str) -> None:
+        """
+        Store a python object made of builtin types (marshal format).
+
+        :param key: tuple identifying the content
+        :param obj: object
+        :param kind: kind of the content
+        """
+        self.put(key, marshal.dumps(obj), kind)
+
+
+def get_store() -> ContentStore:
+    """
+    Return the content store in the XDG cache dir, creating it on first use.
+
+    :return: content store
+    """
+    global _store
+    if _store is None:
+        _store = ContentStore(os.path.join(get_cache_dir(), "store"))
+    return _store
+
+
+def source_key(
+    api_url: str, project: str, package: str, filename: str, revision: str
+) -> tuple:
+    """
+    Key of a source file at a revision.
+    """
+    return (normalize_api_url(api_url), project, package, filename, revision)
@@ -1,19 +1,37 @@
-import datetime
+import argparse
+import copy
+import functools
+import re
 import subprocess
 import sys
+import threading
+import yaml
+from concurrent.futures import Future
 from rich.status import Status
-from typing import Any, Generator
 
 
+from sle_package.utils import profiler
 from sle_package.utils.logger import logger_setup
 
 
 log = logger_setup(__name__)
 
+try:
+    # libyaml C loader, much faster on big files
+    YamlLoader = yaml.CSafeLoader
+except AttributeError:
+    YamlLoader = yaml.SafeLoader  # type: ignore
+
+CPIO_NEWC_MAGIC = b"070701"
+CPIO_HEADER_SIZE = 110
+CPIO_TRAILER = "TRAILER!!!"
+
 
 def running_spinner_decorator(func):
     def wrapper(*args, **kwargs):
-        with Status("Running...", spinner="dots") as status:
+        with profiler.phase(func.__name__), Status(
+            "Running...", spinner="dots"
+        ) as status:
             result = func(*args, **kwargs)
             status.update("Finished!")
         return result
@@ -21,101 +39,54 @@ def running_spinner_decorator(func):
     return wrapper
 
 
-def run_command(
-    command: list[str], capture_output=True, text=True, check=True
-) -> subprocess.CompletedProcess[Any]:
+def memoize(func):
     """
-    Run shell command that does not require redirection.
+    Cache the results of a function per arguments for the whole run.
+    Concurrent calls with the same arguments wait for the first one instead
+    of repeating it. The errors are not cached, the next call tries again,
+    and every caller gets its own copy of the result.
 
-    :param command: command to be executed in format of a list of strings
-    :return: dict with stdout and sterr
+    wrapper.cache_put(result, *args, **kwargs) stores a result fetched in a
+    batch and wrapper.is_cached(*args, **kwargs) checks for one.
     """
-    try:
-        log.debug(">> command = %s", command)
-        result = subprocess.run(
-            command, capture_output=capture_output, text=text, check=check
-        )
-        return result
-    except subprocess.CalledProcessError as e:
-        log.error("Failed to execute: %s", e)
-        # if capture_output is True
-        log.error("Stdout: %s", e.stdout)
-        log.error("Stderr: %s", e.stderr)
-        raise
+    results: dict = {}
+    lock = threading.Lock()
 
+    def cache_key(args: tuple, kwargs: dict) -> tuple:
+        return (args, tuple(sorted(kwargs.items())))
 
-def popen_command(command: list[str], text=True) -> str:
-    """
-    Used to run shell command that requires redirection, requires to run
-    /bin/bash -c <shell_command>, e.g.:
-        command = [
-            "/bin/bash",
-            "-c",
-            f\"\"\"
-            ex <(ls -l) << EOF
-            g/^d/d
-            %!sort
-            %p
-            q!
-            EOF
-            "\"\"
-    :param command: command to be executed in format of a list of strings
-    :return: string with stdout
-    """
-    try:
-        with subprocess.Popen(
-            command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=text
-        ) as process:
-            stdout, stderr = process.communicate()
-
-            if process.returncode != 0:
-                log.error("Failed to execute: %s", command)
-                log.error("Return code: %s", process.returncode)
-                log.error("Stderr: %s", stderr)
-
-            return stdout
-    except FileNotFoundError:
-        log.error("Command not found: %s", command[0])
-        raise
-    except OSError as e:
-        log.error("Error executing command '%s': %s", command[0], e)
-        raise
-    except Exception as e:
-        log.error("Unexpected error: %s", e)
-        raise
-
-
-def run_command_and_stream_output(command: list[str]) -> Generator:
-    """
-    Runs an external command and yields its output line by line.
-    """
-    try:
-        with subprocess.Popen(
-            command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-        ) as process:
-            for line in iter(process.stdout.readline, ""):
-                line = line.strip()
-                if line:
-                    log.debug(">> %s", line)
-                    yield line
-            stderr = ""
-            for line in iter(process.stderr.readline, ""):
-                stderr.join(line)
-            if process.returncode != 0:
-                log.debug("Failed to execute: %s", command)
-                log.debug("Return code: %s", process.returncode)
-                log.debug("Stderr: %s", stderr)
-
-            return process.returncode, stderr
-    except FileNotFoundError:
-        log.error("%s not found", command[0])
-        raise
-    except OSError as e:
-        log.error("Error executing command '%s': %s", command[0], e)
-        raise
-    except Exception as e:
-        log.error("Unexpected error: %s", e)
-        raise
+    def cache_put(result, *args, **kwargs) -> None:
+        future: Future = Future()
+        future.set_result(result)
+        with lock:
+            results.setdefault(cache_key(args, kwargs), future)
+
+    def is_cached(*args, **kwargs) -> bool:
+        with lock:
+            return cache_key(args, kwargs) in results
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = cache_key(args, kwargs)
+        with lock:
+            future = results.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = results[key] = Future()
+        if is_owner:
+            try:
+                future.set_result(func(*args, **kwargs))
+            except Exception as e:
+                with lock:
+                    del results[key]
+                # the concurrent callers of this attempt get the error too
+                future.set_exception(e)
+        return copy.deepcopy(future.result())
+
+    wrapper.cache_clear = results.clear  # type: ignore
+    wrapper.cache_put = cache_put  # type: ignore
+    wrapper.is_cached = is_cached  # type: ignore
+    return wrapper
 
 
 def pager_command(command: list[str], output) -> None:
@@ -156,22 +127,54 @@ def split_lines_ignore_empty(text: str) -> list[str]:
     return [line.strip() for line in text.splitlines() if line.strip()]
 
 
-def count_days(start_date_str: str, end_date_str: str = "") -> int:
+def valid_regex(pattern: str) -> re.Pattern:
+    """
+    Validate if a string is a valid regular expression to be used in argparse
     """
-    Calculates the number of days between 2 dates
+    try:
+        return re.compile(pattern)
+    except re.error as exc:
+        msg = f"Not a valid regular expression: '{pattern}': {exc}."
+        raise argparse.ArgumentTypeError(msg) from exc
+
 
-    :param initial_date: initial date for the days calculation
-    :param final_date: final date for the days calculation
-    :return: number of the days between 2 dates
+def valid_jobs(jobs: str) -> int:
+    """
+    Validate if the number of parallel jobs is a positive number to be used in argparse
     """
     try:
-        start_date = datetime.date.fromisoformat(start_date_str)
-        if end_date_str:
-            end_date = datetime.date.fromisoformat(end_date_str)
-        else:
-            end_date = datetime.date.today()
-        time_difference = end_date - start_date
-        return time_difference.days
-    except ValueError:
-        log.error("Invalid date format. Please use YYYY-MM-DD.")
-        raise
+        if int(jobs) <= 0:
+            msg = "Jobs must be a nonzero positive number."
+            raise argparse.ArgumentTypeError(msg)
+        return int(jobs)
+    except ValueError as exc:
+        msg = f"Not a valid jobs: '{jobs}'. Must a nonzero positive number."
+        raise argparse.ArgumentTypeError(msg) from exc
+
+
+def parse_cpio(data: bytes) -> dict[str, bytes]:
+    """
+    Extract the regular files of a cpio archive in newc format, as returned
+    by the OBS view=cpio downloads.
+
+    :param data: cpio archive
+    :return: dict file name -> content
+    """
+    files = {}
+    offset = 0
+    while offset + CPIO_HEADER_SIZE <= len(data):
+        header = data[offset : offset + CPIO_HEADER_SIZE]
+        if header[:6] != CPIO_NEWC_MAGIC:
+            raise ValueError(f"Invalid cpio header at offset {offset}.")
+        # 13 fields of 8 hex digits after the magic
+        fields = [int(header[6 + i * 8 : 14 + i * 8], 16) for i in range(13)]
+        mode, filesize, namesize = fields[1], fields[6], fields[11]
+        name_start = offset + CPIO_HEADER_SIZE
+        name = data[name_start : name_start + namesize - 1].decode("utf-8")
+        data_start = (name_start + namesize + 3) & ~3
+        if name == CPIO_TRAILER:
+            break
+        if mode & 0o170000 == 0o100000:
+            files[name] = data[data_start : data_start + filesize]
+        offset = (data_start + filesize + 3) & ~3
+    return files